@@ -1,46 +1,136 @@
 
+import contextlib
+import csv
+import io
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from heapq import heappop, heappush
+from multiprocessing.shared_memory import SharedMemory
+from typing import Iterator
+import numpy as np
+
 from algorithm.lattice.Lattice import Lattice
-from algorithm.lattice.Voxel import Bond
+from algorithm.lattice.Voxel import Voxel, Bond, BOND_TYPES, BOND_TYPE_CODES
 from algorithm.symmetry.Surroundings import Surroundings
-from algorithm.symmetry.SymmetryDf import SymmetryDf
+from algorithm.symmetry.SymmetryDf import SymmetryDf, _share
 
 from algorithm.painting.Mesovoxel import Mesovoxel
 from algorithm.painting.Painter import Painter
 
+# --- process pool helpers for Moses.run_multistart ---
+_multistart_moses = None
+_multistart_shm = None
+
+def _init_multistart_worker(coords: np.ndarray, cargo: np.ndarray, cargo_coords: np.ndarray,
+                            initial_paint: tuple[np.ndarray, np.ndarray, np.ndarray],
+                            masks_spec: tuple[str, tuple, str], fingerprints: np.ndarray):
+    """rebuild the lattice + its (shared) symmetry table once per worker process"""
+    global _multistart_moses, _multistart_shm
+    voxels = [Voxel(coords=tuple(c), cargo=g, cargo_coords=tuple(cc))
+              for c, g, cc in zip(coords.tolist(), cargo.tolist(), cargo_coords.tolist())]
+    lattice = Lattice(voxels, is_unit_cell=False)
+    lattice.bond_color[:], lattice.bond_type[:], lattice.id2[:] = initial_paint
+
+    name, shape, dtype = masks_spec
+    _multistart_shm = SharedMemory(name=name)
+    masks = np.ndarray(shape, dtype=np.dtype(dtype), buffer=_multistart_shm.buf)
+    symmetry_df = SymmetryDf(lattice, Surroundings(lattice, window="periodic"), cache=False,
+                             precomputed={"masks": masks, "fingerprints": fingerprints})
+    _multistart_moses = Moses(lattice, symmetry_df=symmetry_df)
+
+def _multistart_worker(seed: int|None) -> tuple[int|None, int, int, int]:
+    with contextlib.redirect_stdout(io.StringIO()):
+        return _multistart_moses._attempt(seed)
+
+
 class Moses:
     """the class for painting via the MOSES algorithm"""
-    def __init__(self, lattice: Lattice):
-        self.lattice = lattice
-        # computes all symmetries, filling symmetry_df
-        # with all possible voxel pairs and their symmetries
-        self.surroundings = Surroundings(self.lattice)
-        self.symmetry_df = SymmetryDf(self.lattice, self.surroundings)  # => a useful function
+    def __init__(self, lattice: Lattice, primitive_cell: bool=False, symmetry: str="eager", n_workers: int=1,
+                 symmetry_cache: bool=None, symmetry_df: SymmetryDf=None, seed: int=None):
+        """
+        Args:
+            primitive_cell: paint only one period of a lattice tiled from a smaller cell, then copy
+                the coloring onto the full lattice at the end of run(). self.lattice is then that
+                reduced cell, and every voxel id in self.mesovoxel / self.symmetry_df / self.painter
+                refers to self.lattice, not to the lattice passed in (self.full_lattice),
+                see full_voxel to go from one to the other
+            symmetry_cache: reuse symmetries of identical lattices from the on-disk SymmetryCache
+                (off by default, None defers to $MOSES_CACHE)
+        """
+        self.full_lattice = lattice
+        self.lattice = lattice.primitive_cell() if primitive_cell else lattice
+        if symmetry_df is not None: # reuse the symmetries already computed for this lattice
+            self.surroundings = symmetry_df.surroundings
+            self.symmetry_df = symmetry_df
+        else:
+            # computes all symmetries, filling symmetry_df
+            # with all possible voxel pairs and their symmetries
+            self.surroundings = Surroundings(self.lattice, window="periodic")
+            # (symmetry="lazy" only computes the voxel pairs the painting actually asks about,
+            # n_workers > 1 computes them all in a process pool, symmetry_cache reuses them from disk)
+            self.symmetry_df = SymmetryDf(self.lattice, self.surroundings, mode=symmetry, n_workers=n_workers,
+                                          cache=symmetry_cache)  # => a useful function
         self.has_symmetry = lambda v1, v2: self.symmetry_df.has_symmetry(v1, v2)
 
+        # the paint on the lattice before MOSES, so it can be painted again from scratch
+        self.initial_paint = (self.lattice.bond_color.copy(), self.lattice.bond_type.copy(), self.lattice.id2.copy())
+        self.init_painting(seed)
+
+    def init_painting(self, seed: int=None):
+        """
+        (re)start painting from the initial lattice. With a seed, the structural voxels and
+        the order bonds are painted in come from a seeded shuffle of the lattice order
+        """
+        self.lattice.bond_color[:], self.lattice.bond_type[:], self.lattice.id2[:] = self.initial_paint
+        self.seed = seed
+        self.rng = np.random.default_rng(seed) if seed is not None else None
+        order = self.rng.permutation(len(self.lattice.voxels)) if self.rng is not None else None
+
         # initialize the structural voxels
-        self.mesovoxel = Mesovoxel(self.lattice, self.has_symmetry)
-        self.painter = Painter(lattice, self.symmetry_df)
+        self.mesovoxel = Mesovoxel(self.lattice, self.has_symmetry, self.symmetry_df.classes, order)
+        self.painter = Painter(self.lattice, self.symmetry_df)
         self.n_colors = 0
-        self.uncolored_bonds = self.get_uncolored_bonds()
-        self.seen_bonds = set(self.uncolored_bonds)
+        # comp_paint's worklist: the uncolored bonds still to paint grouped by the voxel across
+        # them (the one mapped to paint them), {voxel2.id: deque of (bond number, bond)} with the
+        # bonds numbered in the order they were found, and a heap of (first bond number, voxel2.id)
+        # of the groups (entries may be older than their group's first bond, never newer)
+        self.pending_bonds: dict[int, deque[tuple[int, Bond]]] = {}
+        self.pending_order: list[tuple[int, int]] = []
+        self.seen_bonds: set[Bond] = set()
+        self.enqueue_bonds(self.get_uncolored_bonds())
+        # whether map_lattice has written the final colors into the lattice yet
+        self.mapped = False
 
     def run(self):
         """computes both phases of MOSES algorithm, then maps the rest of the lattice"""
         self.str_paint()
         self.comp_paint()
         self.map_lattice()
+        self.mapped = True
+        self.full_lattice.tile_from(self.lattice)
+
+    def full_voxel(self, voxel) -> Voxel:
+        """
+        the voxel of the full lattice at the same coords as a voxel (or id) of self.lattice,
+        eg. full_voxel(v) for v in self.mesovoxel.all_voxels() (the same voxel without primitive_cell)
+        """
+        voxel = self.lattice.get_voxel(voxel)
+        if self.full_lattice is self.lattice:
+            return voxel
+        return self.full_lattice.get_voxel(voxel.coords)
 
     def str_paint(self):
         """paint an initial path of bonds connecting all structural voxels"""
+        structural_voxels = set(self.mesovoxel.structural_voxels)
         for voxel1 in self.mesovoxel.structural_voxels:
             voxel1 = self.lattice.get_voxel(voxel1)
 
             # --- paint path of structural bonds ---
-            for vertex, bond1 in voxel1.bonds.items():
+            for vertex, bond1 in self._shuffled(list(voxel1.bonds.items())):
                 voxel2, bond2 = voxel1.get_partner(vertex)
                 # ensure (1) neither bond is colored yet
                 # and (2) the other voxel is in the mesovoxel + structural
-                if (bond1.color or bond2.color) or (voxel2.id not in self.mesovoxel.structural_voxels):
+                if (bond1.color or bond2.color) or (voxel2.id not in structural_voxels):
                     continue
                 # paint the new bond
                 # print(f"\n--- PAINT S_BOND ({self.n_colors+1}) --- \nvoxel_{voxel1.id} ({bond1.vertex}) <---> voxel_{voxel2.id} ({bond2.vertex})")
@@ -50,74 +140,362 @@ class Moses:
         """
         paint all the complementary bonds, slowly adding in complementary 
         voxels (new sub-equivalence class) as needed.
-        """
-        i = 0
-        while i < len(self.uncolored_bonds):
 
-            # get bond / voxel iteration variables
-            bond1 = self.uncolored_bonds[i]
-            # voxel1 = self.lattice.get_voxel(bond1.voxel)
-
-            i += 1 # early increment for continue safety
-            if bond1.color is not None: 
-                continue # skip bonds which are already painted
+        Works through the pending bonds one voxel at a time: the voxel across the first pending
+        bond is popped, and its bonds are painted for as long as they're the next ones in line
+        (so the coloring is the same as painting bond by bond in the order they were found).
+        Bonds leave the worklist as soon as the painter marks their voxels dirty.
+        """
+        self.drop_painted_bonds()
+        while self.pending_order:
+            number, v2_id = heappop(self.pending_order)
+            group = self.pending_bonds.get(v2_id)
+            if not group:
+                continue
+            if group[0][0] != number: # its first bonds were painted meanwhile, requeue it as it is now
+                heappush(self.pending_order, (group[0][0], v2_id))
+                continue
 
-            # get the partner
-            voxel2, bond2 = bond1.partner.voxel, bond1.partner
+            while group and (not self.pending_order or group[0][0] < self.pending_order[0][0]):
+                _, bond1 = group.popleft()
+                self.paint_comp_bond(bond1)
+                self.drop_painted_bonds()
+                group = self.pending_bonds.get(v2_id)
+            if group:
+                heappush(self.pending_order, (group[0][0], v2_id))
 
-            # CASE 1: VOXEL IS ALREADY MAPPED
-            if voxel2.id2: 
-                pv = self.mesovoxel.get_pv(voxel2.id2) # get the proto-voxel representing the equivalence class
-                self.painter.map_paint(pv, voxel2, flip=False)
+    def paint_comp_bond(self, bond1: Bond):
+        """map the voxel across an uncolored bond from its mesoparent, then give the bond a new color if still needed"""
+        # get the partner
+        voxel2, bond2 = bond1.partner.voxel, bond1.partner
 
-                # --- paint the new bond if still necessary ---
-                if self.paint_new_bond(bond1, bond2, "complementary"):
-                    self.painter.map_paint(voxel2, pv, flip=False) # map back onto proto_voxel
-                    continue
-            
-            # CASE 2: VOXEL NOT MAPPED YET
-            sv, cv = self.mesovoxel.get_mesoparents(voxel2)
-            pv, flip = None, False
-
-            # map either flipping complementary bonds or not based on equivalence class
-            # if touching sv, mesovoxel.add_comp_voxel(v2, sv)
-            if voxel2.is_touching(sv.id2, type=2): 
-                # if we need to add this to the mesovoxel
-                if not self.mesovoxel.in_mesovoxel(-sv.id2, type=2):
-                    self.mesovoxel.add_comp_voxel(voxel2, sv)
-                    pv, flip = sv, True
-                    self.add_uncolored_bonds(voxel2.bonds.values())
-
-                self.painter.map_paint(sv, voxel2, flip=True)
-                pv, flip = (cv, False) if cv else (sv, True)
-
-            else: # if not touching its sv, map(sv -> v2)
-                self.painter.map_paint(sv, voxel2, flip=False)
-                pv, flip = sv, False
-                voxel2.set_id2(sv.id2)
+        # CASE 1: VOXEL IS ALREADY MAPPED
+        if voxel2.id2: 
+            pv = self.mesovoxel.get_pv(voxel2.id2) # get the proto-voxel representing the equivalence class
+            self.painter.map_paint(pv, voxel2, flip=False)
 
             # --- paint the new bond if still necessary ---
             if self.paint_new_bond(bond1, bond2, "complementary"):
-                self.painter.map_paint(voxel2, sv, flip) # map back onto proto_voxel
+                self.painter.map_paint(voxel2, pv, flip=False) # map back onto proto_voxel
+                return
+        
+        # CASE 2: VOXEL NOT MAPPED YET
+        sv, cv = self.mesovoxel.get_mesoparents(voxel2)
+        pv, flip = None, False
+
+        # map either flipping complementary bonds or not based on equivalence class
+        # if touching sv, mesovoxel.add_comp_voxel(v2, sv)
+        if voxel2.is_touching(sv.id2, type=2): 
+            # if we need to add this to the mesovoxel
+            if not self.mesovoxel.in_mesovoxel(-sv.id2, type=2):
+                self.mesovoxel.add_comp_voxel(voxel2, sv)
+                pv, flip = sv, True
+                self.add_uncolored_bonds(voxel2.bonds.values())
+
+            self.painter.map_paint(sv, voxel2, flip=True)
+            pv, flip = (cv, False) if cv else (sv, True)
+
+        else: # if not touching its sv, map(sv -> v2)
+            self.painter.map_paint(sv, voxel2, flip=False)
+            pv, flip = sv, False
+            voxel2.set_id2(sv.id2)
+
+        # --- paint the new bond if still necessary ---
+        if self.paint_new_bond(bond1, bond2, "complementary"):
+            self.painter.map_paint(voxel2, sv, flip) # map back onto proto_voxel
+
+    def map_lattice(self, batched: bool=True):
+        """once we have a finalized mesovoxel, map the unique voxels onto the rest of the lattice
+        
+        the mapping is done for all voxels at once through the lattice arrays when it's provably
+        the same as mapping them one by one (see map_lattice_batched), otherwise one by one"""
+        if batched and self.map_lattice_batched():
+            return
+        self.map_lattice_sequential()
 
-    def map_lattice(self):
-        """once we have a finalized mesovoxel, map the unique voxels onto the rest of the lattice"""
-        for v in self.lattice.voxels:
+    def map_lattice_sequential(self, lattice: Lattice=None, painter: Painter=None):
+        """map_lattice, one voxel at a time (onto a paint_copy of self.lattice + its own painter if given)"""
+        lattice = lattice or self.lattice
+        painter = painter or self.painter
+        for v in lattice.voxels:
             if self.mesovoxel.in_mesovoxel(v):
                 continue
             # copy-pasting logic from comp_paint.CASE_2
-            sv, cv = self.mesovoxel.get_mesoparents(v)
+            sv, cv = (p and lattice.voxels[p.id] for p in self.mesovoxel.get_mesoparents(v.id))
             if cv and v.is_touching(sv.id2, type=2):
-                self.painter.map_paint(cv, v)
+                painter.map_paint(cv, v)
                 v.set_id2(cv.id2)
             else:
                 if v.is_touching(sv.id2, type=2):
-                    self.painter.map_paint(sv, v, flip=True)
+                    painter.map_paint(sv, v, flip=True)
                     v.set_id2(-sv.id2)
                 else:
-                    self.painter.map_paint(sv, v)
+                    painter.map_paint(sv, v)
                     v.set_id2(sv.id2)
 
+    def map_lattice_batched(self) -> bool:
+        """
+        map_lattice for all voxels at once. Once the mesovoxel is final, every other voxel just
+        copies the (rotated, maybe flipped) colors of its parent, so they can all be written with
+        one fancy-indexed assignment into the lattice's N x 6 color array.
+
+        Returns:
+            whether the lattice was mapped (see batched_mapping)
+        """
+        mapping = self.batched_mapping()
+        if mapping is None:
+            return False
+
+        children, bond_color, bond_type, id2 = mapping
+        self.lattice.bond_color[:] = bond_color
+        self.lattice.bond_type[:] = bond_type
+        self.lattice.id2[:] = id2
+        self.painter.colors_changed(children.tolist())
+        return True
+
+    def batched_mapping(self) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]|None:
+        """
+        the result of map_lattice computed for all voxels at once, without touching the lattice.
+
+        This gives the same result as mapping one by one as long as every parent is fully painted,
+        the new colors agree with the bonds painted already, every bond ends up complementary to
+        its partner and no voxel ends up palindromic.
+
+        Returns:
+            children (ids of the voxels mapped), bond_color (N, 6), bond_type (N, 6), id2 (N,)
+            or None if the batched mapping doesn't apply
+        """
+        lattice, mesovoxel = self.lattice, self.mesovoxel
+
+        # --- parents + id2's ---
+        # whether a voxel touches its class (and so which parent it gets) depends on the id2's
+        # given to the voxels before it, so this part goes in order (on plain ints)
+        partner = lattice.partner.tolist()
+        id2 = lattice.id2.tolist()
+        children, parents, flips = [], [], []
+        for v_id in range(len(lattice.voxels)):
+            if v_id in mesovoxel.members:
+                continue
+            class_id2 = mesovoxel.parent_id2[v_id]
+            sv_id = mesovoxel.adj_list[class_id2][0]
+            cv_id = mesovoxel.comp_parents.get(class_id2)
+            touching = id2[sv_id] in [id2[u] for u in partner[v_id]]
+
+            if cv_id is not None and touching:
+                parent, flip, id2[v_id] = cv_id, False, id2[cv_id]
+            elif touching:
+                parent, flip, id2[v_id] = sv_id, True, -id2[sv_id]
+            else:
+                parent, flip, id2[v_id] = sv_id, False, id2[sv_id]
+            children.append(v_id)
+            parents.append(parent)
+            flips.append(flip)
+
+        if not children:
+            return np.array(children, dtype=int), lattice.bond_color.copy(), lattice.bond_type.copy(), np.array(id2)
+        children, parents, flips = np.array(children), np.array(parents), np.array(flips)
+
+        # --- colors ---
+        # each child takes its parent's bonds through their first common symmetry
+        # (with a fully painted parent, the first symmetry paints every bond already)
+        symops = self.symmetry_df.first_symops(parents, children)
+        parent_colors = lattice.bond_color[parents]
+        parent_types = lattice.bond_type[parents]
+        if np.any(symops < 0) or np.any(parent_colors == 0):
+            return None
+
+        neg = np.where(flips[:, None] & (parent_types == BOND_TYPE_CODES["complementary"]), -1, 1)
+        colors = parent_colors * neg
+        cols = self.painter.rotation_group.vertex_permutations[symops]
+        rows = children[:, None]
+
+        # bonds painted before must already have these colors
+        old_colors, old_types = lattice.bond_color[rows, cols], lattice.bond_type[rows, cols]
+        painted = old_colors != 0
+        if np.any(old_colors[painted] != colors[painted]) or np.any(old_types[painted] != parent_types[painted]):
+            return None
+
+        bond_color, bond_type = lattice.bond_color.copy(), lattice.bond_type.copy()
+        bond_color[rows, cols] = colors
+        bond_type[rows, cols] = parent_types
+
+        # every bond of a child must match its partner bond, and no child may be palindromic
+        partners, opposite = lattice.partner[children], np.array(Voxel.OPPOSITE)
+        child_colors = bond_color[children]
+        if (np.any(child_colors != -bond_color[partners, opposite])
+                or np.any(bond_type[children] != bond_type[partners, opposite])
+                or np.any(child_colors[:, :, None] == -child_colors[:, None, :])):
+            return None
+
+        return children, bond_color, bond_type, np.array(id2, dtype=lattice.id2.dtype)
+
+    # --- multi-start ---
+    def run_multistart(self, k: int, seed: int=0, n_workers: int=1, lower_bound: int=1) -> list[tuple[int|None, int, int, int]]:
+        """
+        run MOSES k times with differently shuffled voxel + bond orders (the first run in
+        lattice order, like run()) and keep the coloring with the fewest colors, then the fewest
+        complementary voxels (among those leaving the fewest bonds unpainted). All runs share
+        this Moses' symmetry table, and runs on n_workers > 1 go to a process pool. Stops early
+        once a fully painted run gets down to lower_bound colors and no complementary voxels.
+
+        Returns:
+            (seed, n_colors, n_complementary, n_unpainted) of every finished run, in the order
+            they finished (self is left painted with the best one)
+        """
+        seeds = [None] + [int(s.generate_state(1)[0]) for s in np.random.SeedSequence(seed).spawn(k - 1)]
+        done = lambda r: r[3] == 0 and (r[1], r[2]) <= (lower_bound, 0)
+        results = []
+
+        if n_workers <= 1:
+            for s in seeds:
+                results.append(self._attempt(s))
+                if done(results[-1]):
+                    break
+        else:
+            lattice = self.lattice
+            masks = _share(np.ascontiguousarray(self.symmetry_df.symmetries.masks))
+            try:
+                spec = (masks[0].name, masks[1].shape, masks[1].dtype.str)
+                init_args = (
+                    lattice.coords, lattice.cargo, lattice.cargo_coords, self.initial_paint,
+                    spec, self.symmetry_df.fingerprint_array()
+                )
+                with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_multistart_worker, initargs=init_args) as pool:
+                    futures = [pool.submit(_multistart_worker, s) for s in seeds]
+                    for future in as_completed(futures):
+                        results.append(future.result())
+                        if done(results[-1]):
+                            for f in futures:
+                                f.cancel()
+                            break
+            finally:
+                masks[0].close()
+                masks[0].unlink()
+
+        # repaint self with the best run (ties go to the earliest seed)
+        best = min(results, key=lambda r: (r[3], r[1], r[2], seeds.index(r[0])))
+        if n_workers > 1 or self.seed != best[0]:
+            self._attempt(best[0])
+        return results
+
+    def _attempt(self, seed: int|None) -> tuple[int|None, int, int, int]:
+        """paint the lattice from scratch in the order given by seed"""
+        self.init_painting(seed)
+        self.run()
+        n_unpainted = int(np.count_nonzero(self.lattice.bond_color == 0))
+        return seed, self.n_colors, len(self.mesovoxel.complementary_voxels), n_unpainted
+
+    # --- exact painting ---
+    def run_exact(self, time_limit: float=60.0) -> dict:
+        """
+        repaint the MOSES mesovoxel with as few colors as possible by solving it as a MILP
+        (see ExactSolver), running MOSES first if it hasn't been. Gives up after time_limit
+        seconds, keeping the best coloring found so far.
+
+        Returns:
+            info: the solver status, n_colors, dual_bound and optimality gaps (see ExactSolver.solve)
+        """
+        from algorithm.painting.ExactSolver import ExactSolver # scipy is only needed here
+
+        if not self.mapped:
+            self.run()
+        return ExactSolver(self, time_limit=time_limit).solve()
+
+    # --- streaming output ---
+    def mapped_arrays(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        bond_color (N, 6), bond_type (N, 6) and id2 (N,) of the painted lattice, once the mesovoxel
+        is final. If map_lattice hasn't run yet, they're computed without changing the lattice
+        """
+        lattice = self.lattice
+        if self.mapped:
+            return lattice.bond_color, lattice.bond_type, lattice.id2
+
+        mapping = self.batched_mapping()
+        if mapping is not None:
+            return mapping[1:]
+
+        # map one by one onto a copy of the paint, with a throwaway painter so neither the
+        # lattice nor self.painter's counters / memos change
+        scratch = lattice.paint_copy()
+        self.map_lattice_sequential(scratch, Painter(scratch, self.symmetry_df))
+        return scratch.bond_color, scratch.bond_type, scratch.id2
+
+    def iter_mapped_chunks(self, chunk_size: int=65536, repeats: tuple[int, int, int]=None) -> Iterator[dict[str, np.ndarray]]:
+        """
+        the painted voxels in chunks of up to chunk_size, as arrays
+            coords (m, 3), id2 (m,), colors (m, 6), types (m, 6) (index into BOND_TYPES)
+        with bonds in Voxel.VERTICES order. Only one chunk is in memory at a time, and the
+        painted lattice can be tiled repeats times along each axis (in primitive_cell mode it's
+        tiled back up to the full lattice by default)
+        """
+        if repeats is None:
+            repeats = tuple(f // c for f, c in zip(self.full_lattice.dimensions, self.lattice.dimensions))
+        bond_color, bond_type, id2 = self.mapped_arrays()
+        coords = self.lattice.coords
+        n, dims = len(coords), np.array(self.lattice.dimensions)
+
+        total = n * int(np.prod(repeats))
+        for start in range(0, total, chunk_size):
+            index = np.arange(start, min(start + chunk_size, total))
+            v_ids = index % n
+            repeat = np.stack(np.unravel_index(index // n, repeats), axis=-1)
+            yield {
+                "coords": coords[v_ids] + repeat * dims,
+                "id2": id2[v_ids],
+                "colors": bond_color[v_ids],
+                "types": bond_type[v_ids],
+            }
+
+    def iter_mapped_voxels(self, repeats: tuple[int, int, int]=None) -> Iterator[tuple]:
+        """
+        yields (coords, id2, colors, types) of every painted voxel one by one, where colors + types
+        are 6-tuples in Voxel.VERTICES order (None = unpainted), without making Voxel objects
+        """
+        for chunk in self.iter_mapped_chunks(repeats=repeats):
+            for coords, id2, colors, types in zip(chunk["coords"].tolist(), chunk["id2"].tolist(),
+                                                  chunk["colors"].tolist(), chunk["types"].tolist()):
+                yield (
+                    tuple(coords),
+                    id2 or None,
+                    tuple(c or None for c in colors),
+                    tuple(BOND_TYPES[t] for t in types)
+                )
+
+    def write_mapped_voxels(self, path: str, chunk_size: int=65536, repeats: tuple[int, int, int]=None) -> int:
+        """
+        stream the painted voxels (see iter_mapped_chunks) to a .csv or .npy file chunk by chunk
+        (unpainted bonds have color 0). The .npy file holds one structured record per voxel (coords, id2, colors, types) and is
+        filled through a memmap. Returns the number of voxels written
+        """
+        chunks = self.iter_mapped_chunks(chunk_size, repeats)
+        if str(path).endswith(".npy"):
+            if repeats is None:
+                repeats = tuple(f // c for f, c in zip(self.full_lattice.dimensions, self.lattice.dimensions))
+            total = len(self.lattice.voxels) * int(np.prod(repeats))
+            dtype = np.dtype([("coords", np.int32, 3), ("id2", np.int32), ("colors", np.int32, 6), ("types", np.int8, 6)])
+            out = np.lib.format.open_memmap(path, mode="w+", dtype=dtype, shape=(total,))
+            n = 0
+            for chunk in chunks:
+                m = len(chunk["id2"])
+                for name in dtype.names:
+                    out[name][n:n+m] = chunk[name]
+                n += m
+            out.flush()
+            del out
+            return n
+
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["x", "y", "z", "id2"] + [f"color{v}" for v in Voxel.V_NAMES] + [f"type{v}" for v in Voxel.V_NAMES])
+            n = 0
+            for chunk in chunks:
+                types = np.array([t or "" for t in BOND_TYPES], dtype=object)[chunk["types"]]
+                rows = np.column_stack([chunk["coords"], chunk["id2"], chunk["colors"], types])
+                writer.writerows(rows.tolist())
+                n += len(rows)
+        return n
+
     # --- utils ---
     def paint_new_bond(self, bond1: Bond, bond2: Bond, type:str="structural") -> int:
         """paints the new color connecting bond1 and bond2 only if they're not none
@@ -149,10 +527,31 @@ class Moses:
                     bond_queue.append(bond)
                     bonds.add((bond.voxel.id, vertex))
         
-        return bond_queue
+        return self._shuffled(bond_queue)
     
     def add_uncolored_bonds(self, bonds: list[Bond]):
+        self.enqueue_bonds(self._shuffled(list(bonds)))
+
+    def enqueue_bonds(self, bonds: list[Bond]):
+        """add the uncolored bonds never seen before to comp_paint's worklist, in order"""
         for b in bonds:
             if b.color is None and b not in self.seen_bonds:
-                self.uncolored_bonds.append(b) 
-                self.seen_bonds.add(b)
\ No newline at end of file
+                self.seen_bonds.add(b)
+                v2_id = b.partner.voxel.id
+                group = self.pending_bonds.setdefault(v2_id, deque())
+                if not group:
+                    heappush(self.pending_order, (len(self.seen_bonds), v2_id))
+                group.append((len(self.seen_bonds), b))
+
+    def drop_painted_bonds(self):
+        """drop the bonds painted since the last call from comp_paint's worklist"""
+        for v_id in self.painter.take_dirty(): # (painting a bond marks the voxels on both sides dirty)
+            group = self.pending_bonds.get(v_id)
+            if group:
+                self.pending_bonds[v_id] = deque(item for item in group if item[1].color is None)
+
+    def _shuffled(self, items: list) -> list:
+        """the items in a seeded random order (or as is without a seed)"""
+        if self.rng is None:
+            return items
+        return [items[i] for i in self.rng.permutation(len(items))]
@@ -1,11 +1,23 @@
 
+import copy
 import numpy as np
-from algorithm.lattice.Voxel import Voxel, Bond
+from algorithm.lattice.Voxel import Voxel, Bond, BOND_TYPE_CODES
+from algorithm.symmetry.RotationGroup import RotationGroup
 
 class Lattice:
     """store the basic unit cell"""
+    # cargo orientations (cargo_coords) are interned onto a grid of this spacing: two orientations
+    # which round to the same grid point (ie. within ORIENTATION_QUANTUM/2 along every axis, give
+    # or take the rounding of the halfway points) are the same orientation
+    ORIENTATION_QUANTUM = 0.01
+    # the cube rotations the orientations are closed under, shared by every lattice
+    ROTATION_GROUP = RotationGroup()
+
     def __init__(self, voxels: list[Voxel], is_unit_cell: bool=True):
-        
+        # voxels reused from an older lattice take their data back out of it first
+        for v in voxels:
+            v._unbind()
+
         # get the dimensions of the lattice that was inputted
         x = 0 if is_unit_cell else 1
         self.xdim = max([v.coords[0] for v in voxels]) +x
@@ -16,82 +28,213 @@ class Lattice:
 
         # print(f"lattice found dimensions: {self.xdim, self.ydim, self.zdim}")
 
-        self.voxels = voxels
-        self.unit_cell_voxels = []
-        self.voxel_dict = {}
+        self.is_unit_cell = is_unit_cell
+        self.voxels: list[Voxel] = []
+        self.unit_cell_voxels: list[Voxel] = []
+        # bumped on every change to the voxels, so anything derived from them
+        # (eg. memoized surroundings) knows when to rebuild
+        self.version = 0
         self.init_voxels(voxels, is_unit_cell)
+
+        # structure-of-arrays storage of every voxel (indexed by voxel.id),
+        # the Voxel / Bond objects in self.voxels become views over these
+        self.init_arrays()
         self.fill_partners()
 
     def init_voxels(self, voxels: list[Voxel], is_unit_cell: bool=True):
-        """fills in self.voxels and self.unit_cell_voxels based on whether
-        the user supplied a unit cell or not"""
-
-        # set initial voxel.id's (prob a more elegant soln, find later)
-        for i, v in enumerate(self.voxels):
-            v.id = i
+        """fills in self.voxels and self.unit_cell_voxels (and the coords -> voxel.id grid)
+        based on whether the user supplied a unit cell or not. The supplied list is left as is"""
 
         # --- IS A UNIT CELL ---
+        # split off the voxels in the last layer of any dimension in one pass
         if is_unit_cell:
-            for v in self.voxels:
-                # if in the last layer of any dimension
+            for v in voxels:
                 if v.coords[0]==self.xdim or v.coords[1]==self.ydim or v.coords[2]==self.zdim:
-                    # print(f"v{v.id} in last layer {v.coords}")
                     self.unit_cell_voxels.append(v)
-            
-            for v in self.unit_cell_voxels:
-                self.voxels.remove(v)
-                
-            # redo the id's
-            for i, v in enumerate(self.voxels):
-                v.id = i
-            for i, v in enumerate(self.unit_cell_voxels):
-                v.id = i + len(self.voxels)
-            
-            # redo the IDs
-            for v in self.voxels:
-                self.voxel_dict[v.coords] = v.id
-            
+                else:
+                    self.voxels.append(v)
         # --- IS NOT A UNIT CELL ---
-        # parse voxels for unit_cell_voxels and voxels
-        elif not is_unit_cell:
-            # redo the IDs
-            for v in self.voxels:
-                self.voxel_dict[v.coords] = v.id
+        else:
+            self.voxels = list(voxels)
 
+        # voxel.id's are the index into self.voxels, followed by the unit cell voxels
+        for i, v in enumerate(self.voxels):
+            v.id = i
+        for i, v in enumerate(self.unit_cell_voxels):
+            v.id = i + len(self.voxels)
+
+        # dense coords -> voxel.id lookup (-1 = no voxel there)
+        self.id_grid = np.full(self.dimensions, -1, dtype=np.int32)
+        coords = np.array([v.coords for v in self.voxels], dtype=np.int32).reshape(-1, 3)
+        self.id_grid[tuple(coords.T)] = np.arange(len(self.voxels), dtype=np.int32)
+
+        # parse voxels for unit_cell_voxels (a copy of the first layer of each dimension
+        # on the far side of the lattice)
+        if not is_unit_cell:
             xy_layer = [(x, y, self.unit_dimensions[2]-1) for x in range(self.unit_dimensions[0]) for y in range(self.unit_dimensions[1])]
             yz_layer = [(self.unit_dimensions[0]-1, y, z) for y in range(self.unit_dimensions[1]) for z in range(self.unit_dimensions[2])]
             xz_layer = [(x, self.unit_dimensions[1]-1, z) for x in range(self.unit_dimensions[0]) for z in range(self.unit_dimensions[2])]
 
-            all_old_coords = []
-            for new_coords in xy_layer:
-                old_coords = (new_coords[0] % (self.dimensions[0]), new_coords[1] % (self.dimensions[1]), 0)
-                all_old_coords.append(old_coords)
-            for new_coords in yz_layer:
-                old_coords = (0, new_coords[1] % (self.dimensions[1]), new_coords[2] % (self.dimensions[2]))
-                all_old_coords.append(old_coords)
-            for new_coords in xz_layer:
-                old_coords = (new_coords[0] % (self.dimensions[0]), 0, new_coords[2] % (self.dimensions[2]))
-                all_old_coords.append(old_coords)
-
             # iterate through the unit layers and add the corresponding voxels
             seen = set()
-            for i, new_coords in enumerate(xy_layer + yz_layer + xz_layer):
+            for new_coords in xy_layer + yz_layer + xz_layer:
                 if new_coords in seen: # ignore overlapping coordinates
                     continue
-                # create new voxel which would correspond to here
-                old_coords = all_old_coords[i]
-                old_v = self.get_voxel(old_coords)
+                # create new voxel which would correspond to here (wrapped back into the lattice)
+                old_v = self.voxels[self.id_grid[tuple(c % d for c, d in zip(new_coords, self.dimensions))]]
                 new_v = Voxel(
                     coords=new_coords,
                     cargo=old_v.cargo,
                     cargo_coords=old_v.cargo_coords,
-                    id=len(voxels) + len(self.unit_cell_voxels)
+                    id=len(self.voxels) + len(self.unit_cell_voxels)
                 )
                 self.unit_cell_voxels.append(new_v)
                 seen.add(new_coords)
-                # print(f'adding new voxel @ {new_coords}')
 
 
+    def init_arrays(self):
+        """
+        move the data of self.voxels into contiguous arrays:
+            coords (N, 3), cargo (N,), cargo_coords (N, 3),
+            bond_color (N, 6) (0 = uncolored), bond_type (N, 6) (index into BOND_TYPES),
+            partner (N, 6) (voxel.id of the bond partner, -1 = none yet), id2 (N,) (0 = none yet)
+        where bonds are in Voxel.VERTICES order
+        """
+        n = len(self.voxels)
+        self.coords = np.array([v.coords for v in self.voxels], dtype=np.int32).reshape(n, 3)
+        self.cargo = np.array([v.cargo for v in self.voxels], dtype=np.int32)
+        self.cargo_coords = np.array([v.cargo_coords for v in self.voxels], dtype=float).reshape(n, 3)
+        self.bond_color = np.zeros((n, 6), dtype=np.int32)
+        self.bond_type = np.zeros((n, 6), dtype=np.int8)
+        self.partner = np.full((n, 6), -1, dtype=np.int32)
+        self.id2 = np.zeros(n, dtype=np.int32)
+        # the orientation tables are (re)built on first use after any change (see orientation_id)
+        self.orientation_version = None
+
+        for v in self.voxels:
+            # keep any bonds painted before the voxel was added
+            for i, bond in enumerate(v.bonds.values()):
+                self.bond_color[v.id, i] = bond.color or 0
+                self.bond_type[v.id, i] = BOND_TYPE_CODES[bond.type]
+            self.id2[v.id] = v.id2 or 0
+            v._bind(self, v.id)
+
+    def init_orientations(self):
+        """
+        intern the cargo orientations as small ints, closed under the cube rotations so
+        rotating an orientation never leaves the table:
+            orientations (K, 3) int: each orientation in units of ORIENTATION_QUANTUM
+            orientation_id (N,) int32: index of each voxel's cargo_coords into orientations
+            centered_orientation: id of (0, 0, 0)
+            orientation_rotations (24, K) int32: id of orientation k rotated by RotationGroup element g
+        """
+        group = self.ROTATION_GROUP
+
+        # every rotation of every voxel's (quantized) cargo_coords, interned together
+        # (along with the centered orientation, which empty lattice sites get)
+        quantized = np.rint(self.cargo_coords / self.ORIENTATION_QUANTUM).astype(np.int32)
+        quantized = np.vstack([quantized, np.zeros((1, 3), dtype=np.int32)])
+        rotated = np.einsum('gij,nj->gni', group.matrices, quantized).reshape(-1, 3)
+        self._orientations, first, ids = np.unique(rotated, axis=0, return_index=True, return_inverse=True)
+        ids = ids.reshape(len(group), len(quantized)).astype(np.int32)
+        self._orientation_id = ids[group.identity, :-1]
+        self._centered_orientation = int(ids[group.identity, -1])
+
+        # orientation k first showed up as voxel n rotated by h, so rotating it by g
+        # gives voxel n rotated by (g after h)
+        h, n = np.divmod(first, len(quantized))
+        self._orientation_rotations = ids[group.compose[:, h], n]
+        self.orientation_version = self.version
+
+    def _check_orientations(self):
+        if self.orientation_version != self.version:
+            self.init_orientations()
+
+    @property
+    def orientations(self) -> np.ndarray:
+        self._check_orientations()
+        return self._orientations
+
+    @property
+    def orientation_id(self) -> np.ndarray:
+        self._check_orientations()
+        return self._orientation_id
+
+    @property
+    def centered_orientation(self) -> int:
+        self._check_orientations()
+        return self._centered_orientation
+
+    @property
+    def orientation_rotations(self) -> np.ndarray:
+        self._check_orientations()
+        return self._orientation_rotations
+
+    # --- primitive cell ---
+    def primitive_period(self) -> tuple[int, int, int]:
+        """
+        smallest translational period of the cargo / cargo_coords along each axis
+        (a divisor of that dimension). Periods are kept >= 2 where the lattice allows,
+        since a period of 1 would bond a voxel to itself
+        """
+        if np.any(self.id_grid < 0): # not every lattice site is filled, leave as is
+            return self.dimensions
+
+        cargo_grid = self.cargo[self.id_grid]
+        orientation_grid = self.orientation_id[self.id_grid]
+
+        period = []
+        for axis, dim in enumerate(self.dimensions):
+            for p in range(min(2, dim), dim+1):
+                if dim % p:
+                    continue
+                if (np.array_equal(cargo_grid, np.roll(cargo_grid, p, axis=axis))
+                        and np.array_equal(orientation_grid, np.roll(orientation_grid, p, axis=axis))):
+                    period.append(p)
+                    break
+        return tuple(period)
+
+    def primitive_cell(self) -> 'Lattice':
+        """
+        the lattice reduced to one period along each axis (or itself if it doesn't repeat),
+        with its voxels in the same relative order as here
+        """
+        period = self.primitive_period()
+        if period == tuple(self.dimensions):
+            return self
+        voxels = [
+            Voxel(coords=v.coords, cargo=v.cargo, cargo_coords=v.cargo_coords)
+            for v in self.voxels if all(c < p for c, p in zip(v.coords, period))
+        ]
+        return Lattice(voxels, is_unit_cell=False)
+
+    def paint_copy(self) -> 'Lattice':
+        """
+        a lattice sharing this one's geometry (coords, cargo, partners, ...) but with its own
+        copy of the paint (bond colors / types + id2's), to paint on without touching this one
+        """
+        scratch = copy.copy(self)
+        scratch.bond_color, scratch.bond_type, scratch.id2 = self.bond_color.copy(), self.bond_type.copy(), self.id2.copy()
+        scratch.voxels = []
+        for v_id in range(len(self.voxels)):
+            voxel = Voxel.__new__(Voxel)
+            voxel._bind(scratch, v_id)
+            scratch.voxels.append(voxel)
+        return scratch
+
+    def tile_from(self, cell: 'Lattice'):
+        """copy the bond colors / types and id2's of a primitive cell onto every repeat of it in this lattice"""
+        if cell is self:
+            return
+        cell_ids = cell.id_grid[tuple((self.coords % np.array(cell.dimensions)).T)]
+        self.bond_color[:] = cell.bond_color[cell_ids]
+        self.bond_type[:] = cell.bond_type[cell_ids]
+        self.id2[:] = cell.id2[cell_ids]
+
+    def mark_changed(self):
+        """call after editing voxel cargo / cargo_coords in place to invalidate derived data"""
+        self.version += 1
+
     def find_partner(self, voxel, vertex: tuple[float,float,float]) -> tuple[Voxel, Bond]:
         """given a voxel and a vertex on that voxel, return what voxel in the lattice it's connected to
         
@@ -102,44 +245,63 @@ class Lattice:
             partner_voxel, partner_bond
         """
         v = self.get_voxel(voxel)
-        partner_coords = tuple(np.array(v.coords) + 2*np.array(vertex))
+        i = Voxel.VERTEX_INDEX[vertex]
+        pv = self.voxels[self.partner[v.id, i]]
 
-        # wrap around to make sure it's within our coordinate bounds
-        px, py, pz = partner_coords[0] % self.xdim, partner_coords[1] % self.ydim, partner_coords[2] % self.zdim
-        pv = self.get_voxel((px,py,pz))
-
-        # also get partner bond in that direction
-        pb_vertex = tuple(-np.array(vertex)) # convert direction to vertex (1/2)
-        pb = pv.get_bond(pb_vertex)
+        # also get partner bond in that direction (the opposite vertex)
+        pb = Bond.view(pv, Voxel.OPPOSITE[i])
 
         return pv, pb
     
+    def init_neighbors(self) -> np.ndarray:
+        """
+        (N, 6) table of the voxel.id touching each vertex of every voxel,
+        wrapping around the periodic boundaries of the lattice
+        """
+        # a voxel's neighbor through a vertex is 2*vertex (one lattice step) away
+        steps = (2*np.array(Voxel.VERTICES)).astype(np.int32)
+        neighbor_coords = self.coords[:, None, :] + steps[None, :, :]
+        flat = np.ravel_multi_index(tuple(np.moveaxis(neighbor_coords, -1, 0)), self.dimensions, mode='wrap')
+        return self.id_grid.ravel()[flat]
+
     def fill_partners(self):
-        """fill in all bond partners in voxel objects in place"""
-        for v in self.voxels:
-            for vertex in v.vertices:
-                b = v.get_bond(vertex)
-                # skip if bond already has partner
-                if b.partner is not None:
-                    continue
-                pv, pb = self.find_partner(v, vertex)
-                # set the partners
-                b.set_partner(pb)
-                pb.set_partner(b)
+        """fill in all bond partners (the partner array behind the voxel objects) in place"""
+        self.partner[:] = self.init_neighbors()
+
+    def neighbor_id2(self, voxel=None) -> np.ndarray:
+        """
+        id2 of the voxels touching each vertex of the given voxel (6,),
+        or of every voxel in the lattice (N, 6) if none is given (0 = no id2 yet)
+        """
+        if voxel is None:
+            return self.id2[self.partner]
+        return self.id2[self.partner[self.get_voxel(voxel).id]]
 
-    def get_voxel(self, v) -> Voxel:
-        """ get the voxel obj in the lattice based on either its ID or its lattice coords """
+    def get_voxel(self, v) -> Voxel|list[Voxel]:
+        """ get the voxel obj in the lattice based on either its ID or its lattice coords
+        (or a list of voxels for an (M, 3) array of lattice coords) """
         if isinstance(v, Voxel): # CASE 0: supplied Voxel object already
             return v
-        elif isinstance(v, int): # CASE 1: supplied voxel.id (int)
-            voxel_obj = self.voxels[v]
-        elif isinstance(v, tuple): # CASE 2: supplied lattice coords (tuple)
-            i = self.voxel_dict[v]
-            voxel_obj = self.voxels[i]
-        elif isinstance(v, np.ndarray): # CASE 3: supplied lattice coords (np)
-            i = self.voxel_dict[tuple(v)]
-            voxel_obj = self.voxels[i]
-        else: # CASE 4: invalid type
+        elif isinstance(v, (int, np.integer)): # CASE 1: supplied voxel.id (int)
+            return self.voxels[v]
+        elif isinstance(v, (tuple, np.ndarray)): # CASE 2: supplied lattice coords (tuple / np)
+            ids = self.voxel_ids(v)
+            if ids.ndim == 0:
+                return self.voxels[ids]
+            return [self.voxels[i] for i in ids]
+        else: # CASE 3: invalid type
             raise ValueError(f"invalid voxel.id type: {type(v)}")
-        
-        return voxel_obj
\ No newline at end of file
+
+    def voxel_ids(self, coords) -> np.ndarray:
+        """ voxel.id at each of the lattice coords in a (3,) or (M, 3) array """
+        coords = np.asarray(coords)
+        if coords.shape[-1:] != (3,) or not np.issubdtype(coords.dtype, np.number):
+            raise ValueError(f"invalid lattice coords: {coords}")
+        idx = coords.astype(np.int64)
+        inside = (idx == coords).all(axis=-1) & (idx >= 0).all(axis=-1) & (idx < self.dimensions).all(axis=-1)
+        if not np.all(inside):
+            raise KeyError(f"no voxel in the lattice at {coords[~inside].tolist()}")
+        ids = self.id_grid[tuple(np.moveaxis(idx, -1, 0))]
+        if np.any(ids < 0):
+            raise KeyError(f"no voxel in the lattice at {coords[ids < 0].tolist()}")
+        return ids
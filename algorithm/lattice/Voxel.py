@@ -1,67 +1,233 @@
 import logging
 
+# bond types are stored as small ints in the lattice arrays (0 = no type yet)
+BOND_TYPES = (None, "structural", "complementary")
+BOND_TYPE_CODES = {t: i for i, t in enumerate(BOND_TYPES)}
+
 class Bond:
-    def __init__(self, voxel: 'Voxel'=None, vertex: tuple[float, float, float]=None, 
+    """
+    A bond on one vertex of a voxel. Once its voxel belongs to a Lattice this is only
+    a lightweight view over the lattice's bond_color / bond_type / partner arrays,
+    otherwise it stores its own state.
+    """
+    __slots__ = ('voxel', 'index', '_color', '_type', '_partner')
+
+    def __init__(self, voxel: 'Voxel'=None, vertex: tuple[float, float, float]=None,
                  color: int=None, type: str=None, partner: 'Bond'=None):
         self.voxel = voxel
-        self.vertex = vertex
-        self.color = color
-        self.type = type
-        self.partner = partner
+        self.index = Voxel.VERTEX_INDEX[vertex] if vertex is not None else None
+        self._color = color
+        self._type = type
+        self._partner = partner
+
+    @classmethod
+    def view(cls, voxel: 'Voxel', index: int) -> 'Bond':
+        """the bond on vertex index of a voxel bound to a lattice"""
+        bond = cls.__new__(cls)
+        bond.voxel = voxel
+        bond.index = index
+        return bond
+
+    def _lattice(self):
+        return self.voxel.lattice if self.voxel is not None else None
+
+    # bonds are created on demand, so compare them by what they point at
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, Bond):
+            return NotImplemented
+        if self._lattice() is None:
+            return self is other
+        return self.voxel is other.voxel and self.index == other.index
+
+    def __hash__(self) -> int:
+        if self._lattice() is None:
+            return id(self)
+        return hash((id(self.voxel), self.index))
+
+    # array-backed state
+    @property
+    def vertex(self) -> tuple[float, float, float]:
+        return Voxel.VERTICES[self.index] if self.index is not None else None
+
+    @property
+    def color(self) -> int|None:
+        lattice = self._lattice()
+        if lattice is None:
+            return self._color
+        color = lattice.bond_color[self.voxel.id, self.index]
+        return int(color) if color else None
+
+    @property
+    def type(self) -> str|None:
+        lattice = self._lattice()
+        if lattice is None:
+            return self._type
+        return BOND_TYPES[lattice.bond_type[self.voxel.id, self.index]]
+
+    @property
+    def partner(self) -> 'Bond|None':
+        lattice = self._lattice()
+        if lattice is None:
+            return self._partner
+        partner_id = lattice.partner[self.voxel.id, self.index]
+        if partner_id < 0:
+            return None
+        return Bond.view(lattice.voxels[partner_id], Voxel.OPPOSITE[self.index])
 
     # setting methods
     def set_color(self, color: int):
-        self.color = color
+        lattice = self._lattice()
+        if lattice is None:
+            self._color = color
+        else:
+            lattice.bond_color[self.voxel.id, self.index] = color if color is not None else 0
     def set_partner(self, partner: 'Bond'):
-        self.partner = partner
+        lattice = self._lattice()
+        if lattice is None:
+            self._partner = partner
+        else:
+            lattice.partner[self.voxel.id, self.index] = partner.voxel.id if partner is not None else -1
     def set_type(self, type: str=None):
-        self.type = type
+        lattice = self._lattice()
+        if lattice is None:
+            self._type = type
+        else:
+            lattice.bond_type[self.voxel.id, self.index] = BOND_TYPE_CODES[type]
 
     # getting methods
     def get_partner(self) -> 'Bond':
         return self.partner
     def get_label(self) -> str:
-        i = self.voxel.vertices.index(self.vertex)
-        return self.voxel.v_names[i]
+        return Voxel.V_NAMES[self.index]
     def get_partner_voxel(self) -> 'Voxel|None':
-        return self.partner.voxel if self.partner else None
+        partner = self.partner
+        return partner.voxel if partner else None
 
 class Voxel:
-    def __init__(self, coords: tuple[float, float, float], cargo: int, 
+    # vector (euclidean) representing direction of each vertex
+    # wrt. the voxel @ (0,0,0), shared by all voxels
+    VERTICES = (
+        (0.5, 0, 0), (-0.5, 0, 0),   # +-x
+        (0, 0.5, 0), (0, -0.5, 0),   # +-y
+        (0, 0, 0.5), (0, 0, -0.5)    # +-z
+    )
+    V_NAMES = ( # for labeling purposes
+        "+x", "-x",
+        "+y", "-y",
+        "+z", "-z"
+    )
+    VERTEX_INDEX = {v: i for i, v in enumerate(VERTICES)}
+    # index of the vertex pointing the opposite way (the partner's side of a bond)
+    OPPOSITE = (1, 0, 3, 2, 5, 4)
+
+    # kept as (read-only) attributes for older callers
+    vertices = VERTICES
+    v_names = V_NAMES
+
+    __slots__ = ('id', 'lattice', '_id2', '_coords', '_cargo', '_cargo_coords', '_bonds')
+
+    def __init__(self, coords: tuple[float, float, float], cargo: int,
                  cargo_coords: tuple[float, float, float]=(0,0,0), id: int=None):
         """the essential unit of our lattice ---
-        a point group with 6 bonds + an oriented cargo"""
+        a point group with 6 bonds + an oriented cargo
+
+        A voxel keeps its own data until it's added to a Lattice, after which
+        it's a view over the lattice arrays at index voxel.id"""
 
         # essential info
         self.id = id # ID is the voxel's index into parent Lattice)
-        self.coords = coords
-        self.cargo = cargo
-        self.cargo_coords = cargo_coords
-        # mesovoxel id - which unique voxel in the unique set does this correspond 
+        self._coords = coords
+        self._cargo = cargo
+        self._cargo_coords = cargo_coords
+        # mesovoxel id - which unique voxel in the unique set does this correspond
         # to, and is it complementary? (-)
-        self.id2 = None
-
-        # vector (euclidean) representing direction of each vertex 
-        # wrt. the voxel @ (0,0,0)
-        self.vertices = [
-            (0.5, 0, 0), (-0.5, 0, 0),   # +-x
-            (0, 0.5, 0), (0, -0.5, 0),   # +-y
-            (0, 0, 0.5), (0, 0, -0.5)    # +-z
-        ]
-        self.v_names = [ # for labeling purposes
-            "+x", "-x", 
-            "+y", "-y", 
-            "+z", "-z"
-        ]
+        self._id2 = None
+        # the Lattice whose arrays hold this voxel's data (None until added to one)
+        self.lattice = None
 
         # initialize bonds
-        self.bonds: dict[tuple[float, float, float], Bond] = {}
+        self._bonds: dict[tuple[float, float, float], Bond] = {}
         for v in self.vertices:
-            self.bonds[v] = Bond(voxel=self, vertex=v)
+            self._bonds[v] = Bond(voxel=self, vertex=v)
+
+    # --- lattice binding ---
+    def _bind(self, lattice, id: int):
+        """turn the voxel into a view over the lattice arrays (which should already hold its data)"""
+        self.lattice = lattice
+        self.id = id
+        self._id2 = self._coords = self._cargo = self._cargo_coords = self._bonds = None
+
+    def _unbind(self):
+        """copy the voxel's data back out of its lattice arrays"""
+        if self.lattice is None:
+            return
+        id2, coords, cargo, cargo_coords = self.id2, self.coords, self.cargo, self.cargo_coords
+        bonds = {v: Bond(voxel=self, vertex=v, color=b.color, type=b.type) for v, b in self.bonds.items()}
+        self.lattice = None
+        self._id2, self._coords, self._cargo, self._cargo_coords = id2, coords, cargo, cargo_coords
+        self._bonds = bonds
+
+    # --- array-backed data ---
+    @property
+    def coords(self) -> tuple[int, int, int]:
+        if self.lattice is None:
+            return self._coords
+        return tuple(self.lattice.coords[self.id].tolist())
+
+    @property
+    def cargo(self) -> int:
+        if self.lattice is None:
+            return self._cargo
+        return int(self.lattice.cargo[self.id])
+
+    @cargo.setter
+    def cargo(self, cargo: int):
+        if self.lattice is None:
+            self._cargo = cargo
+        else:
+            self.lattice.cargo[self.id] = cargo
+            self.lattice.mark_changed()
+
+    @property
+    def cargo_coords(self) -> tuple[float, float, float]:
+        if self.lattice is None:
+            return self._cargo_coords
+        return tuple(self.lattice.cargo_coords[self.id].tolist())
+
+    @cargo_coords.setter
+    def cargo_coords(self, cargo_coords: tuple[float, float, float]):
+        if self.lattice is None:
+            self._cargo_coords = cargo_coords
+        else:
+            self.lattice.cargo_coords[self.id] = cargo_coords
+            self.lattice.mark_changed()
+
+    @property
+    def id2(self) -> int|None:
+        if self.lattice is None:
+            return self._id2
+        id2 = self.lattice.id2[self.id]
+        return int(id2) if id2 else None
+
+    @id2.setter
+    def id2(self, id2: int|None):
+        if self.lattice is None:
+            self._id2 = id2
+        else:
+            self.lattice.id2[self.id] = id2 or 0
+
+    @property
+    def bonds(self) -> dict[tuple[float, float, float], Bond]:
+        if self.lattice is None:
+            return self._bonds
+        return {v: Bond.view(self, i) for i, v in enumerate(self.VERTICES)}
 
     def get_bond(self, vertex: tuple[float, float, float]) -> Bond|None:
-        return self.bonds.get(vertex, None)
-    
+        if self.lattice is None:
+            return self._bonds.get(vertex, None)
+        i = self.VERTEX_INDEX.get(vertex)
+        return Bond.view(self, i) if i is not None else None
+
     def get_partner(self, vertex: tuple[float, float, float]) -> tuple['Voxel', Bond]:
         """
         get the partner Voxel + Bond objects in the supplied vertex
@@ -73,7 +239,7 @@ class Voxel:
             logging.error(f"No bond partner found for Voxel {self.id} in direction {vertex}")
             return None, None
         return pv, pb
-    
+
     def set_id2(self, id2: int):
         """sets the unique mesovoxel id of the voxel
         where (+) is structural, (-) is complementary"""
@@ -81,6 +247,14 @@ class Voxel:
 
     def is_touching(self, voxel_id: int, type: int=1):
         """returns whether the given voxel_id (type==1 or 2) is touching the current voxel"""
+        if self.lattice is not None: # answer from the neighbor table
+            neighbors = self.lattice.partner[self.id]
+            if type==1:
+                return bool((neighbors == voxel_id).any())
+            elif type==2:
+                return bool((self.lattice.id2[neighbors] == (voxel_id or 0)).any())
+            return False
+
         for _, bond in self.bonds.items():
             if bond.partner.voxel.id==voxel_id and type==1:
                 return True
@@ -95,4 +269,4 @@ class Voxel:
             str2 = f"\n -> {self.v_names[i]}: color={bond.color}, type={bond.type}"
             str1 = str1+str2
 
-        return str1
\ No newline at end of file
+        return str1
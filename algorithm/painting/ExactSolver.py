@@ -0,0 +1,300 @@
+import time
+import numpy as np
+from scipy.optimize import Bounds, LinearConstraint, milp
+from scipy.sparse import coo_matrix
+
+from algorithm.lattice.Voxel import Voxel, BOND_TYPE_CODES
+
+class ExactSolver:
+    def __init__(self, moses, time_limit: float=60.0):
+        """
+        Exact minimum-color painting of a lattice already painted by MOSES, as a MILP (HiGHS).
+
+        The mesovoxel found by MOSES is kept: every voxel with the same id2 carries the same
+        bonds as the first voxel with that id2 (rotated by a symmetry of the pair), so each
+        lattice bond takes its color from one (id2, bond) "slot". The model then picks a signed
+        color per slot such that
+            1. every bond is complementary to its partner bond (color(a) = -color(b))
+            2. no id2 has a color and its complement (no palindromic voxels), except on the two
+               ends of a bond of an id2 to itself (e.g. +z/-z along an axis of length 1)
+            3. the bonds joining each pair of species (id2's up to sign) are told apart: a structural
+               bond between two different species, or a bond of an id2 to itself, shares no color
+               with a bond joining any other pair of species
+        minimizing the number of unpainted bonds first, then the number of colors used.
+
+        HiGHS can't take a starting solution, so the greedy MOSES coloring is used as an
+        upper bound instead: at most as many colors as it used, and (if it fits the model)
+        no worse an objective.
+        """
+        self.moses = moses
+        self.lattice = moses.lattice
+        self.time_limit = time_limit
+
+        # slots[v, i] = slot of bond i of voxel v, slot_species[a] = which id2 slot a belongs to
+        self.slots, self.slot_species, self.species_id2 = self.init_slots()
+        self.n_slots = len(self.slot_species)
+        self.n_species = len(self.species_id2)
+
+        # the slot pairs to paint complementary, which species pair each one joins, and the
+        # slots bonded to their own id2 (these may hold a color and its complement)
+        self.pairs = self.slot_pairs()
+        self.pair_class, self.exclusive = self.pair_classes(self.pairs)
+        self.self_bonded = np.zeros(self.n_slots, dtype=bool)
+        self.self_bonded[self.pairs[self.is_self_pair(self.pairs)].ravel()] = True
+
+    def init_slots(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        map every lattice bond onto the bond of its id2 prototype it copies. A voxel whose colors
+        don't match its prototype under any symmetry (or has no id2) gets slots of its own, so
+        the greedy coloring always maps onto the slots. Returns (slots, slot_species, id2 of each species)
+        """
+        lattice = self.lattice
+        colors = lattice.bond_color
+        perms = self.moses.symmetry_df.rotation_group.vertex_permutations
+        vertex_slots = np.arange(6)
+
+        slots = np.empty((len(lattice.voxels), 6), dtype=int)
+        prototypes: dict[int, tuple[int, int]] = {} # id2 -> (prototype voxel.id, its first slot)
+        species_id2 = []
+        n_slots = 0
+        for v_id in range(len(lattice.voxels)):
+            id2 = int(lattice.id2[v_id])
+            prototype = prototypes.get(id2) if id2 else None
+            if prototype is not None:
+                p_id, first = prototype
+                # bond i of the prototype lands on bond perm[i] of the voxel
+                for g in self.moses.symmetry_df.symops(p_id, v_id):
+                    if np.array_equal(colors[v_id, perms[g]], colors[p_id]):
+                        slots[v_id, perms[g]] = first + vertex_slots
+                        break
+                else:
+                    prototype = None
+            if prototype is None:
+                if id2 and id2 not in prototypes:
+                    prototypes[id2] = (v_id, n_slots)
+                slots[v_id] = n_slots + vertex_slots
+                species_id2.append(id2)
+                n_slots += 6
+
+        return slots, np.arange(n_slots) // 6, np.array(species_id2, dtype=int)
+
+    def slot_pairs(self) -> np.ndarray:
+        """(n_pairs, 2) unique slots whose colors must be complementary"""
+        partner_slots = self.slots[self.lattice.partner, np.array(Voxel.OPPOSITE)]
+        pairs = np.sort(np.column_stack([self.slots.ravel(), partner_slots.ravel()]), axis=1)
+        return np.unique(pairs, axis=0)
+
+    def species_labels(self, slots: np.ndarray) -> np.ndarray:
+        """the id2 of the species of each slot (voxels without an id2 each get a label of their own)"""
+        id2 = self.species_id2
+        unique = np.abs(id2).max(initial=0) + 1 + np.arange(self.n_species)
+        return np.where(id2 != 0, id2, unique)[self.slot_species[slots]]
+
+    def is_self_pair(self, pairs: np.ndarray) -> np.ndarray:
+        """whether each slot pair bonds an id2 to itself"""
+        labels = self.species_labels(pairs)
+        return labels[:, 0] == labels[:, 1]
+
+    def pair_classes(self, pairs: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        the (unordered) pair of species each slot pair joins, as (class of each pair, whether each
+        class keeps its colors to itself). A complementary voxel (id2 -k) is the same species as k,
+        and each bond of an id2 to itself is a class of its own (so a color and its complement
+        only meet on the two ends of one such bond). Classes with a structural bond (no
+        complementary voxel on either side) or of an id2 to itself can't share a color with any
+        other class
+        """
+        labels = self.species_labels(pairs)
+        self_pair = labels[:, 0] == labels[:, 1]
+        own_class = np.where(self_pair, np.arange(len(pairs)) + 1, 0)
+        keys, classes = np.unique(np.column_stack([np.sort(np.abs(labels), axis=1), own_class]), axis=0, return_inverse=True)
+        classes = classes.ravel()
+        exclusive = keys[:, 2] > 0
+        exclusive[classes[(labels > 0).all(axis=1)]] = True
+        return classes, exclusive
+
+    def build_model(self, C: int, upper_bound: float=None) -> tuple[np.ndarray, LinearConstraint, int]:
+        """
+        the MILP with C colors available, as (objective, constraints, index of the first z variable)
+
+        variables, all binary:
+            x[a, c, s]: slot a has color c+1 with sign s (+, -)
+            z[a]:       slot a stays unpainted
+            p[k, c]:    id2 k may have color +(c+1) (and so can't have -(c+1))
+            u[c]:       color c+1 is used
+            q[t, c]:    color c+1 is used on a bond joining species pair t
+            e[c]:       color c+1 belongs to a species pair which keeps its colors to itself
+        """
+        S, K, T = self.n_slots, self.n_species, len(self.exclusive)
+        W = C + 1 # an unpainted bond costs more than every color together
+        a, c = np.divmod(np.arange(S * C), C) # one entry per (slot, color)
+        x_pos = 2 * np.arange(S * C)
+        x_neg = x_pos + 1
+        z0 = 2 * S * C
+        p = z0 + S + self.slot_species[a] * C + c
+        u0 = z0 + S + K * C
+        q0 = u0 + C
+        e0 = q0 + T * C
+        n_vars = e0 + C
+
+        blocks = [] # (rows, cols, vals, lb, ub) of each group of constraints
+        def add(rows: np.ndarray, cols: np.ndarray, vals: np.ndarray, low: float, high: float):
+            n_rows = int(rows.max()) + 1 if len(rows) else 0
+            blocks.append((rows, cols, vals, np.full(n_rows, low), np.full(n_rows, high)))
+
+        # each slot gets exactly one signed color or stays unpainted
+        add(np.r_[a, a, np.arange(S)], np.r_[x_pos, x_neg, z0 + np.arange(S)], np.ones(2 * S * C + S), 1, 1)
+
+        # no palindromes: +c only if p, -c only if not p (bonds of an id2 to itself are exempt)
+        checked = np.flatnonzero(~self.self_bonded[a])
+        rows = np.arange(len(checked))
+        ones = np.ones(len(checked))
+        add(np.r_[rows, rows], np.r_[x_pos[checked], p[checked]], np.r_[ones, -ones], -np.inf, 0)
+        add(np.r_[rows, rows], np.r_[x_neg[checked], p[checked]], np.r_[ones, ones], -np.inf, 1)
+
+        # color usage
+        rows = np.arange(S * C)
+        add(np.r_[rows, rows, rows], np.r_[x_pos, x_neg, u0 + c], np.r_[np.ones(2 * S * C), -np.ones(S * C)], -np.inf, 0)
+
+        # complementarity: +c on one side iff -c on the other (a slot bound to itself can't be painted)
+        pairs = self.pairs
+        pa, pb = (np.repeat(pairs[:, i], C) * C + np.tile(np.arange(C), len(pairs)) for i in (0, 1))
+        rows = np.arange(len(pa))
+        ones = np.ones(len(pa))
+        add(np.r_[rows, rows], np.r_[2 * pa, 2 * pb + 1], np.r_[ones, -ones], 0, 0)
+        add(np.r_[rows, rows], np.r_[2 * pa + 1, 2 * pb], np.r_[ones, -ones], 0, 0)
+
+        # distinguishability: a color on a pair marks it used by the pair's species pair ...
+        q = q0 + np.repeat(self.pair_class, C) * C + np.tile(np.arange(C), len(pairs))
+        add(np.r_[rows, rows, rows], np.r_[2 * pa, 2 * pa + 1, q], np.r_[ones, ones, -ones], -np.inf, 0)
+        # ... and a color used by a species pair which keeps its colors to itself is used by no other
+        if T > 1:
+            tc = np.flatnonzero(np.repeat(self.exclusive, C))
+            rows = np.arange(len(tc))
+            add(np.r_[rows, rows], np.r_[q0 + tc, e0 + tc % C], np.r_[np.ones(len(tc)), -np.ones(len(tc))], -np.inf, 0)
+            add(np.r_[np.arange(T * C) % C, np.arange(C)], np.r_[q0 + np.arange(T * C), e0 + np.arange(C)],
+                np.r_[np.ones(T * C), np.full(C, T - 1)], -np.inf, T)
+
+        # use colors in order (colors are interchangeable)
+        rows = np.arange(C - 1)
+        add(np.r_[rows, rows], np.r_[u0 + rows, u0 + rows + 1], np.r_[np.ones(C - 1), -np.ones(C - 1)], 0, np.inf)
+
+        # an unpainted slot costs W per lattice bond it colors
+        objective = np.zeros(n_vars)
+        objective[z0:z0 + S] = W * np.bincount(self.slots.ravel(), minlength=S)
+        objective[u0:q0] = 1
+        if upper_bound is not None:
+            cols = np.flatnonzero(objective)
+            add(np.zeros(len(cols), dtype=int), cols, objective[cols], -np.inf, upper_bound)
+
+        offsets = np.cumsum([0] + [len(b[3]) for b in blocks])
+        rows = np.concatenate([b[0] + off for b, off in zip(blocks, offsets)])
+        cols = np.concatenate([b[1] for b in blocks])
+        vals = np.concatenate([b[2] for b in blocks])
+        A = coo_matrix((vals, (rows, cols)), shape=(offsets[-1], n_vars)).tocsr()
+        lb = np.concatenate([b[3] for b in blocks])
+        ub = np.concatenate([b[4] for b in blocks])
+        return objective, LinearConstraint(A, lb, ub), z0
+
+    def solve(self) -> dict:
+        """
+        solve the model within time_limit seconds, and repaint the lattice if it beats MOSES
+        (no more unpainted bonds, and fewer colors)
+
+        Returns:
+            info: {n_colors, n_unpainted (bonds), status, optimal, objective, dual_bound, gap, moses_gap, time, improved}
+            where gap is HiGHS' own gap (wrt. the best MILP solution it found, None without one) and
+            moses_gap the gap between the MOSES coloring and dual_bound (None if it doesn't fit the model)
+        """
+        start = time.time()
+        greedy_slot_colors = self._greedy_slot_colors()
+        n_colors, n_unpainted = self._count(greedy_slot_colors)
+        C = max(n_colors, 1)
+        greedy_objective = (C + 1) * n_unpainted + n_colors # as in build_model
+
+        # the greedy coloring only bounds the model if it's a solution of it
+        fits = self._fits(greedy_slot_colors)
+        objective, constraints, z0 = self.build_model(C, greedy_objective if fits else None)
+        res = milp(
+            objective, constraints=constraints, integrality=np.ones(len(objective)), bounds=Bounds(0, 1),
+            options={"time_limit": max(self.time_limit - (time.time() - start), 1e-3)}
+        )
+
+        info = {
+            "status": res.message,
+            "optimal": res.status == 0,
+            "objective": greedy_objective if fits else None,
+            "dual_bound": getattr(res, "mip_dual_bound", None),
+            "gap": getattr(res, "mip_gap", None),
+            "moses_gap": None,
+            "improved": False,
+        }
+        slot_colors = greedy_slot_colors
+        if res.x is not None:
+            solution = self._decode(res.x, C, z0)
+            exact_colors, exact_unpainted = self._count(solution)
+            if exact_unpainted <= n_unpainted and exact_colors < n_colors:
+                slot_colors = solution
+                self._paint(slot_colors)
+                info["objective"] = res.fun
+                info["improved"] = True
+
+        if fits and info["dual_bound"] is not None:
+            info["moses_gap"] = max(greedy_objective - info["dual_bound"], 0) / max(greedy_objective, 1)
+        info["n_colors"], info["n_unpainted"] = self._count(slot_colors)
+        info["time"] = time.time() - start
+        return info
+
+    # --- utils ---
+    def _greedy_slot_colors(self) -> np.ndarray:
+        """the color of each slot in the current (MOSES) coloring"""
+        slot_colors = np.zeros(self.n_slots, dtype=np.int64)
+        slot_colors[self.slots.ravel()] = self.lattice.bond_color.ravel()
+        return slot_colors
+
+    def _count(self, slot_colors: np.ndarray) -> tuple[int, int]:
+        """(number of colors, number of unpainted lattice bonds) of a slot coloring"""
+        n_colors = len(set(np.abs(slot_colors[slot_colors != 0]).tolist()))
+        return n_colors, int(np.count_nonzero(slot_colors[self.slots] == 0))
+
+    def _fits(self, slot_colors: np.ndarray) -> bool:
+        """whether a slot coloring is a solution of the model (constraints 2 + 3)"""
+        # no id2 has a color and its complement, outside its bonds to itself
+        for k in range(self.n_species):
+            colors = set(slot_colors[(self.slot_species == k) & ~self.self_bonded].tolist())
+            if any(-c in colors for c in colors if c):
+                return False
+
+        # every color of an exclusive species pair is used by that pair only
+        colors = np.abs(slot_colors[self.pairs[:, 0]])
+        painted = colors != 0
+        used = np.unique(np.column_stack([colors[painted], self.pair_class[painted]]), axis=0)
+        shared = np.unique(used[:, 0], return_counts=True)
+        shared = set(shared[0][shared[1] > 1].tolist())
+        return not any(color in shared and self.exclusive[t] for color, t in used.tolist())
+
+    def _decode(self, solution: np.ndarray, C: int, z0: int) -> np.ndarray:
+        """signed color of each slot in a MILP solution, renumbered 1, 2, ... in order of appearance"""
+        picks = solution[:z0].reshape(self.n_slots, C, 2) > 0.5
+        slot_colors = np.zeros(self.n_slots, dtype=np.int64)
+        renumber: dict[int, int] = {}
+        for a, c, s in zip(*np.nonzero(picks)):
+            color = renumber.setdefault(int(c), len(renumber) + 1)
+            slot_colors[a] = -color if s else color
+        return slot_colors
+
+    def _paint(self, slot_colors: np.ndarray):
+        """write the slot colors onto every lattice bond"""
+        lattice = self.lattice
+        lattice.bond_color[:] = slot_colors[self.slots]
+
+        # bonds painted here for the first time take their type from the voxel pair
+        untyped = (lattice.bond_color != 0) & (lattice.bond_type == BOND_TYPE_CODES[None])
+        complementary = (lattice.id2[:, None] < 0) | (lattice.id2[lattice.partner] < 0)
+        lattice.bond_type[untyped & complementary] = BOND_TYPE_CODES["complementary"]
+        lattice.bond_type[untyped & ~complementary] = BOND_TYPE_CODES["structural"]
+        lattice.bond_type[lattice.bond_color == 0] = BOND_TYPE_CODES[None]
+
+        self.moses.painter.colors_changed(range(len(lattice.voxels)))
+        self.moses.n_colors = self._count(slot_colors)[0]
+        self.moses.full_lattice.tile_from(lattice)
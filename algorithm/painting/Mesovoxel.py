@@ -1,26 +1,43 @@
 from algorithm.lattice.Voxel import Voxel
 from algorithm.lattice.Lattice import Lattice
-from typing import Callable, Any
+from typing import Callable, Any, Sequence
 
 class Mesovoxel:
-    def __init__(self, lattice: Lattice, has_symmetry: Callable[[Any, Any], tuple[bool, list]]):
+    def __init__(self, lattice: Lattice, has_symmetry: Callable[[Any, Any], tuple[bool, list]], 
+                 classes: Sequence[int]=None, order: Sequence[int]=None):
         """
         Mesovoxel data structure, which is comprised of two sets
         
         (1) structural voxels:      clearly defined by symmetry alone
         (2) complementary voxels:   starts empty, and we add voxels to it
                                     1-by-1 as we paint bonds
+
+        If the equivalence class of each voxel (indexed by voxel.id) is already known,
+        eg. from SymmetryDf.classes, the structural voxels are read off the classes
+        instead of scanning with has_symmetry.
+
+        The first voxel (in lattice order, or the order of voxel.id's given) of each class
+        becomes its structural voxel.
         """
         # parent lattice/painter classes
         self.lattice = lattice
         self.has_symmetry = has_symmetry
+        self.classes = classes
+        self.order = order
 
         # these two sets uniquely define the mesovoxel
         # can be indexed with id2-1
         self.structural_voxels, self.adj_list = self.init_structural_voxels()
         self.complementary_voxels: list[int] = []
-        
-        self.init_structural_voxels()
+
+        # voxel.id -> id2 of the structural voxel it has symmetry with (its equivalence class),
+        # and structural id2 -> voxel.id of the latest complementary voxel of that class,
+        # so the mesoparents of any voxel are just two lookups
+        self.parent_id2 = self.init_parent_index()
+        self.comp_parents: dict[int, int] = {}
+        # all voxel.id's in the mesovoxel (and just the complementary ones), for quick membership checks
+        self.members: set[int] = set(self.structural_voxels)
+        self.comp_members: set[int] = set()
 
     def init_structural_voxels(self) -> tuple[list[int], dict[int, list[int]]]:
         """
@@ -31,7 +48,10 @@ class Mesovoxel:
                       where adj_list[id2][0] is the proto-voxel
         """
         # iterate over voxels
-        voxels = iter(self.lattice.voxels)
+        if self.order is None:
+            voxels = iter(self.lattice.voxels)
+        else:
+            voxels = (self.lattice.voxels[i] for i in self.order)
 
         # init with first voxel in lattice
         v_0 = next(voxels)
@@ -42,6 +62,9 @@ class Mesovoxel:
         adj_list = {}
         adj_list[1] = [v_0.id]
         
+        if self.classes is not None:
+            return self._init_from_classes(v_0, voxels, structural_voxels, adj_list)
+
         i = 2
         for voxel in voxels:
             for sv in structural_voxels:
@@ -58,12 +81,36 @@ class Mesovoxel:
 
         return structural_voxels, adj_list
     
+    def _init_from_classes(self, v_0: Voxel, voxels, structural_voxels: list[int], 
+                           adj_list: dict[int, list[int]]) -> tuple[list[int], dict[int, list[int]]]:
+        """same as init_structural_voxels, but the first voxel of each class is the structural one"""
+        class_id2 = {self.classes[v_0.id]: 1}
+        for voxel in voxels:
+            c = self.classes[voxel.id]
+            if c in class_id2:
+                adj_list[class_id2[c]].append(voxel.id)
+            else:
+                class_id2[c] = len(class_id2) + 1
+                voxel.set_id2(class_id2[c])
+                structural_voxels.append(voxel.id)
+                adj_list[class_id2[c]] = [voxel.id]
+
+        return structural_voxels, adj_list
+
+
+    def init_parent_index(self) -> list[int]:
+        """id2 of the structural parent of every voxel, read off the adjacency list"""
+        parent_id2 = [0] * len(self.lattice.voxels)
+        for id2, members in self.adj_list.items():
+            for v_id in members:
+                parent_id2[v_id] = id2
+        return parent_id2
 
     def in_mesovoxel(self, voxel: Voxel|int, type=1) -> bool:
         """Returns whether the given voxel is in one of two mesovoxel sets or not."""
         if type==1:
             voxel_id = voxel.id if isinstance(voxel, Voxel) else voxel
-            return voxel_id in self.structural_voxels or voxel_id in self.complementary_voxels
+            return voxel_id in self.members
         elif type==2:
             voxel_id = voxel.id2 if isinstance(voxel, Voxel) else voxel
             in_meso = self.adj_list.get(voxel_id)
@@ -82,20 +129,16 @@ class Mesovoxel:
             NOTE: should this return id1 or id2?
         """
         mesoparents = [None, None]
+        voxel_id = voxel.id if isinstance(voxel, Voxel) else voxel
 
-        #TODO: implement the less-naive way to find this
-        # find the structural voxel with symmetry to the given voxel
-        for s_voxel in self.structural_voxels:
-            has_sym, _ = self.has_symmetry(s_voxel, voxel)
-            if has_sym:
-                mesoparents[0] = self.lattice.get_voxel(s_voxel)
-                break
+        # the structural voxel with symmetry to the given voxel heads its class
+        id2 = self.parent_id2[voxel_id]
+        mesoparents[0] = self.get_pv(id2)
 
-        # also find the complementary voxel
-        for c_voxel in self.complementary_voxels:
-            has_sym, _ = self.has_symmetry(c_voxel, voxel)
-            if has_sym:
-                mesoparents[1] = self.lattice.get_voxel(c_voxel)
+        # and the class's complementary voxel, if it has one yet
+        c_voxel = self.comp_parents.get(id2)
+        if c_voxel is not None:
+            mesoparents[1] = self.lattice.get_voxel(c_voxel)
 
         return mesoparents
     
@@ -112,8 +155,11 @@ class Mesovoxel:
 
         # append the new comp_voxel to the data structures
         self.adj_list[id2] = [comp_voxel.id]
-        if comp_voxel.id not in self.complementary_voxels:
+        if comp_voxel.id not in self.comp_members:
             self.complementary_voxels.append(comp_voxel.id)
+            self.comp_members.add(comp_voxel.id)
+            self.members.add(comp_voxel.id)
+            self.comp_parents[self.parent_id2[comp_voxel.id]] = comp_voxel.id
 
     def contains_voxel(self, voxel: Voxel|int):
         """
@@ -121,7 +167,7 @@ class Mesovoxel:
         eg, whether the mesovoxel 'contains' the supplied voxel
         """
         voxel_id = voxel.id if isinstance(voxel, Voxel) else voxel
-        return True if voxel_id in self.structural_voxels or voxel_id in self.complementary_voxels else False
+        return voxel_id in self.members
     
 
     def all_voxels(self) -> list[int]:
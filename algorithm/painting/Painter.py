@@ -1,7 +1,8 @@
 
+from operator import itemgetter
+
 from algorithm.lattice.Lattice import Lattice
 from algorithm.symmetry.SymmetryDf import SymmetryDf
-from algorithm.symmetry.Rotation import RotationDict
 from algorithm.lattice.Voxel import Bond
 
 class Painter:
@@ -22,12 +23,43 @@ class Painter:
         # important data structure references
         self.lattice = lattice
         self.symmetry_df = symmetry_df
-        self.rot_dict = RotationDict()
+        self.rotation_group = symmetry_df.rotation_group
+
+        # one index gather per rotation, taking a voxel's bonds (in vertex order) 
+        # to the bonds that each of them is rotated onto
+        self.bond_gathers = [itemgetter(*perm) for perm in self.rotation_group.vertex_permutations.tolist()]
 
         # count of total # colors (not including complementary)
         # used to color the mesovoxel
         self.n_colors = 0
 
+        # the (signed) colors currently on each voxel's bonds, split by bond type and
+        # indexed by voxel.id, kept up to date by paint_bonds for the palindromic check
+        # (voxels whose bonds were written outside paint_bonds, see colors_changed,
+        # get their color sets recounted the next time they're needed)
+        self.stale_colors: set[int] = set()
+        self.structural_colors: list[set[int]] = []
+        self.complementary_colors: list[set[int]] = []
+        for v in self.lattice.voxels:
+            self.structural_colors.append(set())
+            self.complementary_colors.append(set())
+            self._recount_colors(v)
+
+        # number of map_paint calls refused because they'd make the child palindromic
+        # (including the ones answered from the no-op memo below)
+        self.palindromic_rejections = 0
+
+        # bumped whenever a bond on the voxel (indexed by voxel.id) is painted,
+        # so a map_paint which changed nothing isn't redone until a new color arrives
+        self.voxel_versions = [0] * len(self.lattice.voxels)
+        self.n_painted = 0
+        # (parent.id, child.id, flip) -> (voxel versions, result) of the last no-op map_paint
+        self.noop_maps: dict[tuple[int, int, bool], tuple[tuple[int, int], int]] = {}
+        self.skipped_remaps = 0
+
+        # ids of the voxels with bonds painted since the last take_dirty (see Moses.comp_paint)
+        self.dirty: set[int] = set()
+
     def self_sym_paint(self, voxel):
         """paint the voxel with its own self symmetries"""
         self.map_paint(voxel, voxel)
@@ -43,26 +75,44 @@ class Painter:
         parent = self.lattice.get_voxel(parent)
         child = self.lattice.get_voxel(child)
 
+        # the outcome only depends on the parent + child bonds, so if neither has been
+        # painted since this exact mapping last changed nothing, it would change nothing again
+        key = (parent.id, child.id, bool(flip))
+        versions = (self.voxel_versions[parent.id], self.voxel_versions[child.id])
+        noop = self.noop_maps.get(key)
+        if noop is not None and noop[0] == versions:
+            self.skipped_remaps += 1
+            if noop[1] == 0: # it would be rejected as palindromic again
+                self.palindromic_rejections += 1
+            return noop[1]
+
+        n_painted = self.n_painted
+        result = self._map_paint(parent, child, flip)
+        if self.n_painted == n_painted:
+            self.noop_maps[key] = (versions, result)
+        return result
+
+    def _map_paint(self, parent, child, flip=False):
         # preemptive check to see if mapping would cause a palindromic error
-        if self.is_palindromic(parent.bonds, child.bonds, flip):
+        if self.is_palindromic(parent, child, flip):
+            self.palindromic_rejections += 1
             return 0
 
-        symlist = self.symmetry_df.symlist(parent, child)
+        symops = self.symmetry_df.symops(parent, child)
+        parent_bonds = tuple(parent.bonds.values())
+        child_bonds = tuple(child.bonds.values())
 
-        for sym in symlist:
-            # rotate parent voxel
-            rotated_parent_bonds = self.rot_dict.rotate_bonds(parent.bonds, sym)
-            self._map_bonds(rotated_parent_bonds, child.bonds, flip)
+        for sym in symops:
+            # rotate parent voxel: gather the child bonds each parent bond lands on
+            self._map_bonds(parent_bonds, self.bond_gathers[sym](child_bonds), flip)
         
         return 1
 
-    def _map_bonds(self, parent_bonds: dict[tuple[int, int, int], Bond], 
-                   child_bonds: dict[tuple[int, int, int], Bond], flip=False) -> None:
-        """handles the nitty gritty in mapping bonds from v1-->v2
-        returns 1 if success, 0 if failure
+    def _map_bonds(self, parent_bonds: tuple[Bond, ...], child_bonds: tuple[Bond, ...], flip=False) -> None:
+        """handles the nitty gritty in mapping bonds from v1-->v2, 
+        where parent_bonds[i] is mapped onto child_bonds[i]
         """
-        for coords, parent_bond in parent_bonds.items():
-            child_bond = child_bonds[coords]
+        for parent_bond, child_bond in zip(parent_bonds, child_bonds):
 
             # don't map None-colored bonds, or onto already-painted bonds
             if parent_bond.color is None or child_bond.color is not None:
@@ -74,32 +124,45 @@ class Painter:
             self.paint_bonds(child_bond, child_bond.partner, color, parent_bond.type)
 
 
-    def is_palindromic(self,  parent_bonds: dict[tuple[int, int, int], Bond], 
-                   child_bonds: dict[tuple[int, int, int], Bond], flip=False) -> int:
+    def is_palindromic(self, parent, child, flip=False) -> int:
         """a PALINDROMIC CHECK before we paint. 
         due to experimental constraints, we want to avoid having both a 
         color and its complement on the same voxel.
         
         returns 1 if palindromic else 0 (good)
         """
-        for pb in parent_bonds.values():
-            if pb.color is None: 
-                continue # no need to check None bonds
-
-            # create the mappable color wrt. whether it would be flipped or nah
-            neg = -1 if flip and pb.type=="complementary" else 1
-            mappable_color = int(neg * pb.color)
-
-            # check all child bonds to see if the potentially mappable color 
-            # would create a palindromic error
-            for cb in child_bonds.values():
-                if cb.color is None:
-                    continue
-                if cb.color==-1*mappable_color or cb.partner.color==mappable_color:
-                    return 1 # is palindromic (bad)
-                
+        if self.stale_colors:
+            for voxel in (parent, child):
+                if voxel.id in self.stale_colors:
+                    self._recount_colors(voxel)
+
+        # the colors the parent would map (complementary ones negated if flip==True)
+        mappable = self.structural_colors[parent.id]
+        if flip:
+            mappable = mappable | {-c for c in self.complementary_colors[parent.id]}
+        else:
+            mappable = mappable | self.complementary_colors[parent.id]
+
+        # palindromic if any of their complements are already on the child
+        for c in self.structural_colors[child.id]:
+            if -c in mappable:
+                return 1
+        for c in self.complementary_colors[child.id]:
+            if -c in mappable:
+                return 1
         return 0 # is not palindromic (good!)
-        
+
+    def _recount_colors(self, voxel) -> None:
+        """rebuild the color sets of a voxel from its bonds"""
+        structural, complementary = self.structural_colors[voxel.id], self.complementary_colors[voxel.id]
+        structural.clear()
+        complementary.clear()
+        self.stale_colors.discard(voxel.id)
+        for bond in voxel.bonds.values():
+            if bond.color is None:
+                continue
+            (complementary if bond.type == "complementary" else structural).add(bond.color)
+
     def paint_bonds(self, bond1: Bond, bond2: Bond, color: int, type: str) -> None:
         """paint a certain color + type onto a bond (bond1) and its partner (bond2)
         
@@ -108,7 +171,35 @@ class Painter:
             type (str): either "complementary" or "structural" depending on whether its between
                         two structurally unique voxels or not
         """
+        repainted = bond1.color is not None or bond2.color is not None
         bond1.set_color(color)
         bond1.set_type(type)
         bond2.set_color(-color)
-        bond2.set_type(type)
\ No newline at end of file
+        bond2.set_type(type)
+
+        self.n_painted += 1
+        self.voxel_versions[bond1.voxel.id] += 1
+        self.voxel_versions[bond2.voxel.id] += 1
+        self.dirty.add(bond1.voxel.id)
+        self.dirty.add(bond2.voxel.id)
+
+        # keep the per-voxel color sets up to date
+        if repainted: # an old color may be gone now, so recount from scratch
+            self._recount_colors(bond1.voxel)
+            self._recount_colors(bond2.voxel)
+        else:
+            colors = self.complementary_colors if type == "complementary" else self.structural_colors
+            colors[bond1.voxel.id].add(color)
+            colors[bond2.voxel.id].add(-color)
+
+    def colors_changed(self, voxel_ids) -> None:
+        """let the painter know the bonds of these voxels were painted directly in the lattice arrays"""
+        for v_id in voxel_ids:
+            self.voxel_versions[v_id] += 1
+        self.stale_colors.update(voxel_ids)
+        self.dirty.update(voxel_ids)
+
+    def take_dirty(self) -> set[int]:
+        """the ids of the voxels with bonds painted since the last call"""
+        dirty, self.dirty = self.dirty, set()
+        return dirty
@@ -0,0 +1,90 @@
+import hashlib
+import numpy as np
+
+from algorithm.symmetry.RotationGroup import RotationGroup
+
+class Fingerprints:
+    """
+    Canonical fingerprints of the surroundings of every voxel in the lattice.
+
+    The surroundings of a voxel are rotated by every symmetry operation, and the
+    lexicographically smallest encoding is picked as its canonical form. Two voxels
+    have symmetry iff some rotation maps one onto the other, so they share a canonical
+    form (and hash) iff they are in the same equivalence class. This finds all classes
+    in O(N*G) instead of sweeping over all O(N^2*G) voxel pairs.
+
+    Cheap rotation invariants (Surroundings.signatures) go in front of the canonical form,
+    so voxels with a signature of their own are set apart without rotating anything.
+    """
+    DIGEST_SIZE = 16
+
+    def __init__(self, lattice, surroundings, rotation_group: RotationGroup, fingerprints: list[bytes]=None):
+        # important references
+        self.lattice = lattice
+        self.surroundings = surroundings
+        self.rotation_group = rotation_group
+
+        # number of voxels whose canonical form was skipped, since their signature
+        # (see Surroundings.signatures) alone already sets them apart from every other voxel
+        self.canonical_skipped = 0
+
+        # one hash per voxel, indexed by voxel.id (unless already known, eg. from a cache)
+        if fingerprints is None:
+            fingerprints = self.compute_fingerprints()
+        self.fingerprints: list[bytes] = fingerprints
+
+        # class index of each voxel (numbered in order of first appearance)
+        # and the sorted voxel ids belonging to each class
+        self.classes, self.class_members = self.init_classes()
+
+    def compute_fingerprints(self) -> list[bytes]:
+        """
+        fingerprints of all voxels: the hash of their signature, followed by their canonical
+        form unless no other voxel shares the signature
+        """
+        signatures = self.surroundings.signatures()
+        _, signature_group, group_sizes = np.unique(signatures, axis=0, return_inverse=True, return_counts=True)
+        shared = group_sizes[signature_group.reshape(-1)] > 1
+
+        fingerprints = []
+        for i, signature in enumerate(signatures):
+            if shared[i]:
+                fingerprints.append(self.fingerprint(i, signature.tobytes()))
+            else:
+                fingerprints.append(hashlib.blake2b(signature.tobytes(), digest_size=self.DIGEST_SIZE).digest())
+                self.canonical_skipped += 1
+        return fingerprints
+
+    def fingerprint(self, voxel, prefix: bytes=b"") -> bytes:
+        """hash of the canonical (lexicographically minimal) encoding of the voxel surroundings"""
+        canonical = self.surroundings.canonical_form(self.lattice.get_voxel(voxel).id)
+        return hashlib.blake2b(prefix + canonical, digest_size=self.DIGEST_SIZE).digest()
+
+    def init_classes(self) -> tuple[np.ndarray, list[np.ndarray]]:
+        """group voxels sharing a fingerprint into equivalence classes"""
+        class_of_fingerprint: dict[bytes, int] = {}
+        classes = np.empty(len(self.fingerprints), dtype=np.int64)
+        for i, fp in enumerate(self.fingerprints):
+            classes[i] = class_of_fingerprint.setdefault(fp, len(class_of_fingerprint))
+
+        order = np.argsort(classes, kind="stable")
+        splits = np.cumsum(np.bincount(classes, minlength=len(class_of_fingerprint)))[:-1]
+        class_members = np.split(order, splits)
+        return classes, class_members
+
+    def filter_info(self) -> dict[str, int]:
+        """
+        how many voxel pairs (i <= j) the signatures alone ruled out, how many more the
+        fingerprints did, and how many canonical forms were skipped
+        """
+        _, group_sizes = np.unique(self.surroundings.signatures(), axis=0, return_counts=True)
+        n = len(self.fingerprints)
+        pairs = lambda sizes: int(sum(s * (s + 1) // 2 for s in sizes))
+        return {
+            "pairs_rejected_by_signature": n * (n + 1) // 2 - pairs(group_sizes),
+            "pairs_rejected_by_fingerprint": pairs(group_sizes) - pairs(map(len, self.class_members)),
+            "canonical_skipped": self.canonical_skipped,
+        }
+
+    def same_class(self, voxel1: int, voxel2: int) -> bool:
+        return self.classes[voxel1] == self.classes[voxel2]
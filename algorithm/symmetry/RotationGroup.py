@@ -0,0 +1,113 @@
+import numpy as np
+
+from algorithm.lattice.Voxel import Voxel, Bond
+
+class RotationGroup:
+    """
+    The 24 proper rotations of the cube (the octahedral group) as exact integer 3x3
+    matrices, enumerated once along with their composition and inverse tables.
+
+    The 37 legacy RotationDict operations (translation, single + double rotations)
+    only contain these 24 distinct group elements, so each legacy label maps onto
+    one group index. Each element is named after the first legacy label reaching it.
+    """
+    AXES = ('X', 'Y', 'Z')
+
+    def __init__(self):
+        # every legacy label with its matrix, in order of preference for naming
+        legacy_matrices = self._init_legacy_matrices()
+
+        matrices: list[np.ndarray] = []
+        self.labels: list[str] = []
+        self.legacy_index: dict[str, int] = {}
+
+        element_index: dict[bytes, int] = {}
+        for label, matrix in legacy_matrices.items():
+            key = matrix.tobytes()
+            if key not in element_index:
+                element_index[key] = len(matrices)
+                matrices.append(matrix)
+                self.labels.append(label)
+            self.legacy_index[label] = element_index[key]
+
+        # (24, 3, 3) int matrices, so rotating row vectors is points @ matrices[g].T
+        self.matrices = np.array(matrices, dtype=int)
+        self.identity = 0
+
+        # compose[a, b] is the element applying b first and then a
+        # inverse[a] is the element undoing a
+        self.compose = np.array([[element_index[(ma @ mb).tobytes()] for mb in matrices] for ma in matrices])
+        self.inverse = np.array([element_index[m.T.tobytes()] for m in matrices])
+
+        # a rotation just permutes the six octahedral vertices (in Voxel.VERTICES order):
+        # vertex_permutations[g, i] is the vertex that vertex i is rotated onto by g
+        self.vertex_permutations = self._init_vertex_permutations()
+
+    def __len__(self) -> int:
+        return len(self.matrices)
+
+    def index(self, rotation) -> int:
+        """group index of a group index / legacy label / integer matrix"""
+        if isinstance(rotation, (int, np.integer)):
+            return int(rotation)
+        if isinstance(rotation, str):
+            if rotation not in self.legacy_index:
+                raise ValueError(f"invalid rotation label: {rotation}")
+            return self.legacy_index[rotation]
+        matrix = np.asarray(rotation, dtype=int)
+        matches = np.flatnonzero((self.matrices == matrix).all(axis=(1, 2)))
+        if len(matches) == 0:
+            raise ValueError(f"not a proper rotation of the cube: {rotation}")
+        return int(matches[0])
+
+    def rotate(self, points: np.ndarray, rotation) -> np.ndarray:
+        """rotate an (n, 3) array of points (or a single point)"""
+        return np.asarray(points) @ self.matrices[self.index(rotation)].T
+
+    def rotation(self, rotation):
+        """the rotation as a function, for code expecting RotationDict-style lambdas"""
+        matrix = self.matrices[self.index(rotation)]
+        return lambda x: np.asarray(x) @ matrix.T
+
+    def rotate_bonds(self, bonds: dict[tuple[float, float, float], Bond], rotation) -> dict[tuple[float, float, float], Bond]:
+        """return a copy of the bonds dict (in Voxel.VERTICES order) keyed by the rotated vertices"""
+        perm = self.vertex_permutations[self.index(rotation)]
+        return {Voxel.VERTICES[j]: bond for j, bond in zip(perm, bonds.values())}
+
+    def _init_vertex_permutations(self) -> np.ndarray:
+        """(24, 6) table of the vertex permutation done by each group element"""
+        vertices = np.array(Voxel.VERTICES)
+        rotated = np.einsum('gij,vj->gvi', self.matrices, vertices)
+        # match each rotated vertex to the (unique) vertex it lands on
+        matches = (rotated[:, :, None, :] == vertices[None, None, :, :]).all(axis=-1)
+        return matches.argmax(axis=-1)
+
+    # --- legacy labels ---
+    def _init_legacy_matrices(self) -> dict[str, np.ndarray]:
+        """
+        matrices of all legacy RotationDict labels: the identity, the 9 single rotations
+        and every ordered pair of single rotations on different axes, where
+        'label1 + label2' applies label2 first (like RotationDict's double rotations)
+        """
+        generators = {
+            'X': np.array([[1, 0, 0], [0, 0, -1], [0, 1, 0]]),
+            'Y': np.array([[0, 0, 1], [0, 1, 0], [-1, 0, 0]]),
+            'Z': np.array([[0, -1, 0], [1, 0, 0], [0, 0, 1]]),
+        }
+        single_rotations = {}
+        for axis in self.AXES:
+            for quarter_turns in (1, 2, 3):
+                label = f'{90*quarter_turns}° {axis}-axis'
+                single_rotations[label] = np.linalg.matrix_power(generators[axis], quarter_turns)
+
+        double_rotations = {}
+        for label1, matrix1 in single_rotations.items():
+            for label2, matrix2 in single_rotations.items():
+                if label1.split(' ')[-1] != label2.split(' ')[-1]:
+                    double_rotations[f'{label1} + {label2}'] = matrix1 @ matrix2
+
+        return {
+            'translation': np.eye(3, dtype=int),
+            **single_rotations,
+            **{key: double_rotations[key] for key in sorted(double_rotations)}
+        }
@@ -1,56 +1,462 @@
+import math
 import numpy as np
+from typing import Any
 from algorithm.lattice.Lattice import Lattice
+from algorithm.symmetry.RotationGroup import RotationGroup
 
 class Surroundings:
-    def __init__(self, lattice: Lattice):
+    WINDOWS = ("periodic", "cube")
+    REPRESENTATIONS = ("auto", "dense", "sparse")
+    # "auto" goes sparse when at most this fraction of the lattice sites is occupied
+    SPARSE_FRACTION = 0.25
+
+    def __init__(self, lattice: Lattice, window: str="cube", representation: str="auto"):
+        """
+        Args:
+            window: "cube" gathers a cube reaching max_dim out from every voxel, "periodic" the
+                smallest cube deciding symmetry the same way (see window_radius). The legacy
+                dict API (voxel_surroundings, as_dict, ...) returns the whole window, so it keeps
+                the cube by default, SymmetryDf only needs the periodic one
+            representation: how symmetry is decided, "dense" compares every cell of the cubes,
+                "sparse" only their occupied cells (see sparse_surroundings), "auto" picks by occupancy
+        """
+        if window not in self.WINDOWS:
+            raise ValueError(f"invalid surroundings window: {window} (expected one of {self.WINDOWS})")
+        if representation not in self.REPRESENTATIONS:
+            raise ValueError(f"invalid surroundings representation: {representation} (expected one of {self.REPRESENTATIONS})")
         self.lattice = lattice
+        self.window = window
+        self.representation = representation
+        self.rotation_group = RotationGroup()
 
+        # hit/miss counters of the memoized surroundings (kept across invalidations)
+        self.cache_hits = 0
+        self.cache_misses = 0
 
-    def voxel_surroundings(self, voxel) -> dict[tuple[float, float, float], int]:
+        # read the lattice into the grids and start with empty caches
+        self.invalidate()
+
+    def invalidate(self):
         """
-        create a cube of surrounding particles all oriented wrt. where 
-        v.cargo_coords would be
+        drop all memoized surroundings and re-read the lattice, done automatically
+        whenever the lattice version changes (see Lattice.mark_changed)
         """
-        v = self.lattice.get_voxel(voxel)
+        # the lattice stored as dense periodic grids indexed by voxel coords, 
+        # so the surroundings of all voxels can be gathered at array speed
+        self.coords, self.cargo_grid, self.cargo_coords_grid = self.init_grids()
+
+        # offsets of every point in the surroundings cube wrt. its center voxel
+        radius = self.window_radius()
+        coord_range = np.arange(-radius, radius+1)
+        x, y, z = np.meshgrid(coord_range, coord_range, coord_range, indexing='ij')
+        self.offsets = np.array([x.flatten(), y.flatten(), z.flatten()]).T
+
+        # each rotation maps the cube onto itself, so it just permutes the cube cells
+        self.cell_permutations = self.init_cell_permutations()
+
+        # the dense / sparse surroundings of every voxel, gathered on first use
+        # (see dense_surroundings / sparse_surroundings)
+        self.dense: np.ndarray|None = None
+        self.sparse: tuple[np.ndarray, np.ndarray, np.ndarray]|None = None
+        occupied_fraction = len(self.occupied_sites()) / max(np.prod(self.lattice.dimensions), 1)
+        self.is_sparse = self.representation == "sparse" or (
+            self.representation == "auto" and occupied_fraction <= self.SPARSE_FRACTION
+        )
+        # and their rotation invariant signatures (see signatures)
+        self.signature_rows: np.ndarray|None = None
+
+        # memoized raw surroundings {voxel.id: surr} and rotated ones {(voxel.id, rotation): surr},
+        # only filled by the legacy dict API (voxel_surroundings / rotated_surroundings), SymmetryDf
+        # decides symmetry on the dense / sparse arrays instead
+        self.surr_cache: dict[int, dict] = {}
+        self.rot_surr_cache: dict[tuple[int, Any], dict] = {}
+        self.lattice_version = self.lattice.version
 
-        xdim, ydim, zdim = self.lattice.dimensions
-        max_dim = max(xdim, ydim, zdim)
+    def window_radius(self) -> int:
+        """
+        how far the surroundings cube reaches out from its center voxel
+
+        The lattice repeats with period d_a along each axis a, so what a cube compares under a
+        rotation taking axis a onto axis b only depends on the pairs (offset mod d_a, offset mod d_b)
+        its offsets along a run through. Any lcm(d_a, d_b) consecutive offsets already run through
+        all of them, so once the cube is that wide for every pair of axes, a larger one decides
+        symmetry exactly the same way. The "periodic" window is the smallest such cube (or the
+        full one, if that's smaller), so long thin lattices don't pay for their longest side cubed.
+        """
+        max_dim = max(self.lattice.dimensions)
+        if self.window == "cube":
+            return max_dim
+        dims = self.lattice.dimensions
+        width = max(math.lcm(int(a), int(b)) for a in dims for b in dims)
+        return min(width // 2, max_dim) # side 2*radius+1 >= width
+
+    def _check_lattice_version(self):
+        if self.lattice_version != self.lattice.version:
+            self.invalidate()
+
+    def cache_info(self) -> dict[str, int]:
+        """
+        hits / misses / current size of the surroundings caches (the legacy_* dict caches
+        only grow through voxel_surroundings / rotated_surroundings)
+        """
+        return {
+            "hits": self.cache_hits,
+            "misses": self.cache_misses,
+            "legacy_surroundings": len(self.surr_cache),
+            "legacy_rotated_surroundings": len(self.rot_surr_cache),
+            "dense_surroundings": 0 if self.dense is None else len(self.dense),
+            "sparse_cells": 0 if self.sparse is None else len(self.sparse[1])
+        }
+
+    def init_grids(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Returns:
+            coords: (N, 3) lattice coords of each voxel, indexed by voxel.id
+            cargo_grid: (xdim, ydim, zdim) cargo of the voxel at each lattice coord
+            cargo_coords_grid: (xdim, ydim, zdim, 3) cargo_coords of the voxel at each lattice coord
+        """
+        coords = self.lattice.coords
 
-        # create a surroundings cube at least max_len out from the center
-        coord_range = np.linspace(-max_dim, max_dim, 2*max_dim+1)
+        cargo_grid = np.zeros(self.lattice.dimensions, dtype=int)
+        cargo_coords_grid = np.zeros((*self.lattice.dimensions, 3), dtype=float)
+        cargo_grid[tuple(coords.T)] = self.lattice.cargo
+        cargo_coords_grid[tuple(coords.T)] = self.lattice.cargo_coords
+        return coords, cargo_grid, cargo_coords_grid
+
+    def init_cell_permutations(self) -> np.ndarray:
+        """
+        Returns:
+            cell_permutations: (24, cube) where cell_permutations[g, m] is the cube cell
+                               that cell m is rotated onto by RotationGroup element g
+        """
+        radius = self.offsets.max()
+        side = 2*radius + 1
+        rotated = np.einsum('gij,mj->gmi', self.rotation_group.matrices, self.offsets) + radius
+        return np.ravel_multi_index(tuple(np.moveaxis(rotated, -1, 0)), (side, side, side))
+
+    def gather_cells(self, offsets: np.ndarray) -> np.ndarray:
+        """(N, n_offsets, 2) int32 (orientation id, cargo) of the lattice site at each offset from every voxel"""
+        cell_grid = np.empty((*self.lattice.dimensions, 2), dtype=np.int32)
+        cell_grid[..., 0] = self.lattice.centered_orientation
+        cell_grid[(*self.coords.T, 0)] = self.lattice.orientation_id
+        cell_grid[..., 1] = self.cargo_grid
+        flat = np.ravel_multi_index(
+            tuple(np.moveaxis(self.coords[:, None, :] + offsets[None, :, :], -1, 0)),
+            self.lattice.dimensions, mode='wrap'
+        )
+        return np.take(cell_grid.reshape(-1, 2), flat, axis=0)
+
+    def signatures(self) -> np.ndarray:
+        """
+        cheap rotation invariants of every voxel's surroundings, so voxels with different
+        signatures can never have symmetry. Memoized.
+
+        Returns:
+            signatures: (N, 19) int64 rows of each lattice site's (cargo, squared cargo offset)
+                        code, for the voxel itself and then sorted over its 6 nearest + 12 next
+                        nearest neighbors (the shells a rotation only shuffles around)
+        """
+        self._check_lattice_version()
+        if self.signature_rows is None:
+            shell_offsets = self.offsets_within(2)
+            shells = (shell_offsets**2).sum(axis=1)
+            cells = self.gather_cells(shell_offsets).astype(np.int64)
+
+            # one code per (cargo, squared norm of the cargo offset) pair
+            norms = (self.lattice.orientations.astype(np.int64)**2).sum(axis=1)[cells[..., 0]]
+            codes = (cells[..., 1] - cells[..., 1].min()) * (norms.max() + 1) + norms
+
+            self.signature_rows = np.column_stack([
+                codes[:, shells == 0],
+                np.sort(codes[:, shells == 1], axis=1),
+                np.sort(codes[:, shells == 2], axis=1)
+            ])
+        return self.signature_rows
+
+    @staticmethod
+    def offsets_within(squared_radius: int) -> np.ndarray:
+        """all integer offsets whose squared length is at most squared_radius"""
+        radius = math.isqrt(squared_radius)
+        coord_range = np.arange(-radius, radius+1)
         x, y, z = np.meshgrid(coord_range, coord_range, coord_range, indexing='ij')
-        coords = np.array([x.flatten(), y.flatten(), z.flatten()]).T
-
-        surr = {}
-        for coord in coords:
-            # convert voxel_surr coords into an index into the original lattice
-            x, y, z = coord + np.array(v.coords)
-            og_x = int((xdim + x) % xdim)
-            og_y = int((ydim + y) % ydim)
-            og_z = int((zdim + z) % zdim)
-            
-            og_voxel = self.lattice.get_voxel((og_x, og_y, og_z))
-
-            # translate the coordinate a little for the accurate surroundings
-            coord = coord + np.array(og_voxel.cargo_coords)
-            surr[tuple(coord)] = og_voxel.cargo
+        offsets = np.array([x.flatten(), y.flatten(), z.flatten()]).T
+        return offsets[(offsets**2).sum(axis=1) <= squared_radius]
+
+    def dense_surroundings(self, voxels=None) -> np.ndarray:
+        """
+        the surroundings cube of voxels as a dense int array, cell by cell in self.offsets order,
+        instead of a dict keyed by float coords. Gathered once for the whole lattice and memoized.
+
+        Args:
+            voxels: Voxels / ids to get the surroundings of (defaults to the whole lattice)
+        Returns:
+            surr: (n_voxels, cube, 2) int32 array where surr[i, m] = (orientation id, cargo) of
+                  the voxel in cell m of voxel i's cube (see Lattice.init_orientations)
+        """
+        self._check_lattice_version()
+        if self.dense is None:
+            self.cache_misses += 1
+            self.dense = self.gather_cells(self.offsets)
+        else:
+            self.cache_hits += 1
+
+        if voxels is None:
+            return self.dense
+        return self.dense[[self.lattice.get_voxel(v).id for v in voxels]]
+
+    @staticmethod
+    def rotate_dense(surr: np.ndarray, orientation_rotation: np.ndarray, cell_permutation: np.ndarray) -> np.ndarray:
+        """
+        rotate dense surroundings (..., cube, 2): every cell moves to the cell it's rotated onto,
+        taking its (rotated) cargo orientation along
+        """
+        rotated = np.empty_like(surr)
+        rotated[..., cell_permutation, 0] = orientation_rotation[surr[..., 0]]
+        rotated[..., cell_permutation, 1] = surr[..., 1]
+        return rotated
+
+    @staticmethod
+    def match_masks(surr1: np.ndarray, surr2: np.ndarray, orientation_rotations: np.ndarray,
+                    cell_permutations: np.ndarray) -> np.ndarray:
+        """
+        bitmasks of the rotations mapping one voxel's dense surroundings (cube, 2) onto each
+        of many others (n, cube, 2), ie. bit k of masks[n] is set iff
+        rotate_dense(surr1, k) is equal to surr2[n]
+        """
+        masks = np.zeros(len(surr2), dtype=np.uint64)
+        for k, (orientation_rotation, cell_permutation) in enumerate(zip(orientation_rotations, cell_permutations)):
+            rotated = Surroundings.rotate_dense(surr1, orientation_rotation, cell_permutation)
+            same = (surr2 == rotated).all(axis=(1, 2))
+            masks[same] |= np.uint64(1 << k)
+        return masks
+
+    def occupied_sites(self) -> np.ndarray:
+        """voxel.id's of the occupied voxels: those with a cargo or an off-center cargo orientation"""
+        return np.flatnonzero((self.lattice.cargo != 0) | (self.lattice.orientation_id != self.lattice.centered_orientation))
+
+    def sparse_surroundings(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        the same cubes as dense_surroundings, but only their occupied cells (the rest of the
+        lattice is cargo 0 in the centered orientation), found straight from the occupied sites.
+        Memoized.
+
+        Returns:
+            ptr: (N+1,) voxel i's cells are cells[ptr[i]:ptr[i+1]]
+            cells: (n_occupied,) int32 cube cell of each occupied cell (sorted per voxel)
+            values: (n_occupied, 2) int32 (orientation id, cargo) of each occupied cell
+        """
+        self._check_lattice_version()
+        if self.sparse is not None:
+            self.cache_hits += 1
+            return self.sparse
+
+        self.cache_misses += 1
+        dims = np.array(self.lattice.dimensions)
+        radius = int(self.offsets.max())
+        side = 2*radius + 1
+        coord_range = np.arange(-radius, radius+1)
+
+        occupied = self.occupied_sites()
+        site_values = np.column_stack([self.lattice.orientation_id[occupied], self.lattice.cargo[occupied]]).astype(np.int32)
+
+        # per axis, the offsets in the cube landing on each residue mod d (padded with -1 cells)
+        images, valid = [], []
+        for d in dims:
+            per_residue = [coord_range[coord_range % d == t] for t in range(d)]
+            width = max(len(o) for o in per_residue)
+            images.append(np.array([np.pad(o, (0, width - len(o))) for o in per_residue]) + radius)
+            valid.append(np.array([np.arange(width) < len(o) for o in per_residue]))
+
+        # every image of every occupied site in every voxel's cube (in chunks of voxels)
+        n = len(self.coords)
+        per_voxel = len(occupied) * np.prod([i.shape[1] for i in images])
+        chunk = max(1, 2**22 // max(per_voxel, 1))
+        voxel_ids, cells, sites = [], [], []
+        for start in range(0, n, chunk):
+            ids = np.arange(start, min(start + chunk, n))
+            delta = (self.coords[occupied][None, :, :] - self.coords[ids][:, None, :]) % dims
+            x, y, z = (images[a][delta[..., a]] for a in range(3))
+            vx, vy, vz = (valid[a][delta[..., a]] for a in range(3))
+            cell = (x[..., :, None, None]*side + y[..., None, :, None])*side + z[..., None, None, :]
+            keep = vx[..., :, None, None] & vy[..., None, :, None] & vz[..., None, None, :]
+            v_idx, s_idx = np.broadcast_to(ids[:, None, None, None, None], keep.shape), \
+                           np.broadcast_to(np.arange(len(occupied))[None, :, None, None, None], keep.shape)
+            voxel_ids.append(v_idx[keep])
+            cells.append(cell[keep])
+            sites.append(s_idx[keep])
 
+        voxel_ids, cells, sites = (np.concatenate(a) if a else np.zeros(0, dtype=int) for a in (voxel_ids, cells, sites))
+        order = np.lexsort((cells, voxel_ids))
+        ptr = np.concatenate([[0], np.cumsum(np.bincount(voxel_ids, minlength=n))])
+        self.sparse = (ptr, cells[order].astype(np.int32), site_values[sites[order]].reshape(-1, 2))
+        return self.sparse
+
+    @staticmethod
+    def rotate_sparse(cells: np.ndarray, values: np.ndarray, orientation_rotation: np.ndarray,
+                      cell_permutation: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """rotate one voxel's sparse surroundings, keeping its cells sorted"""
+        rotated_cells = cell_permutation[cells]
+        order = np.argsort(rotated_cells)
+        rotated_values = np.column_stack([orientation_rotation[values[order, 0]], values[order, 1]])
+        return rotated_cells[order], rotated_values
+
+    @staticmethod
+    def match_masks_sparse(i: int, js: np.ndarray, ptr: np.ndarray, cells: np.ndarray, values: np.ndarray,
+                           orientation_rotations: np.ndarray, cell_permutations: np.ndarray) -> np.ndarray:
+        """match_masks on sparse surroundings, only voxels with as many occupied cells can match"""
+        masks = np.zeros(len(js), dtype=np.uint64)
+        n = ptr[i+1] - ptr[i]
+        candidates = np.flatnonzero(ptr[js+1] - ptr[js] == n)
+        index = ptr[js[candidates]][:, None] + np.arange(n)
+        cells2, values2 = cells[index], values[index]
+        cells1, values1 = cells[ptr[i]:ptr[i+1]], values[ptr[i]:ptr[i+1]]
+        for k, (orientation_rotation, cell_permutation) in enumerate(zip(orientation_rotations, cell_permutations)):
+            rotated_cells, rotated_values = Surroundings.rotate_sparse(cells1, values1, orientation_rotation, cell_permutation)
+            same = (cells2 == rotated_cells).all(axis=1) & (values2 == rotated_values).all(axis=(1, 2))
+            masks[candidates[same]] |= np.uint64(1 << k)
+        return masks
+
+    def shared_arrays(self) -> dict[str, np.ndarray]:
+        """everything match_arrays needs, in the representation in use"""
+        arrays = {
+            "orientation_rotations": self.lattice.orientation_rotations,
+            "cell_permutations": self.cell_permutations,
+        }
+        if self.is_sparse:
+            arrays["sparse_ptr"], arrays["sparse_cells"], arrays["sparse_values"] = self.sparse_surroundings()
+        else:
+            arrays["surr"] = self.dense_surroundings()
+        return arrays
+
+    @staticmethod
+    def match_arrays(arrays: dict[str, np.ndarray], i: int, js: np.ndarray) -> np.ndarray:
+        """symmetry bitmasks of voxel i with each of the voxels js, from the arrays of shared_arrays"""
+        if "surr" in arrays:
+            surr = arrays["surr"]
+            return Surroundings.match_masks(surr[i], surr[js], arrays["orientation_rotations"], arrays["cell_permutations"])
+        return Surroundings.match_masks_sparse(
+            i, js, arrays["sparse_ptr"], arrays["sparse_cells"], arrays["sparse_values"],
+            arrays["orientation_rotations"], arrays["cell_permutations"]
+        )
+
+    def symmetry_masks(self, i: int, js: np.ndarray) -> np.ndarray:
+        """
+        bitmasks of the rotations mapping the surroundings of voxel i onto those of each
+        of the voxels js (bit k set iff RotationGroup element k does)
+        """
+        return self.match_arrays(self.shared_arrays(), i, np.asarray(js, dtype=int))
+
+    def canonical_form(self, i: int) -> bytes:
+        """the lexicographically smallest encoding of voxel i's surroundings over all rotations"""
+        rotations = zip(self.lattice.orientation_rotations, self.cell_permutations)
+        if self.is_sparse:
+            ptr, cells, values = self.sparse_surroundings()
+            cells, values = cells[ptr[i]:ptr[i+1]], values[ptr[i]:ptr[i+1]]
+            return min(
+                b"".join(a.tobytes() for a in self.rotate_sparse(cells, values, orientation_rotation, cell_permutation))
+                for orientation_rotation, cell_permutation in rotations
+            )
+        # (dense cubes always list their cells in the same order)
+        surr = self.dense_surroundings()[i]
+        return min(
+            np.ascontiguousarray(self.rotate_dense(surr, orientation_rotation, cell_permutation)).tobytes()
+            for orientation_rotation, cell_permutation in rotations
+        )
+
+    def batch_surroundings(self, voxels=None) -> np.ndarray:
+        """
+        create the surroundings cube of many voxels at once through periodic gathers 
+        into the lattice grids
+
+        Args:
+            voxels: Voxels / ids to get the surroundings of (defaults to the whole lattice)
+        Returns:
+            surr: (n_voxels, cube, 4) array where surr[i, p] = (*coords, cargo) of the point p
+                  of voxel i's cube, with coords oriented wrt. where its cargo_coords would be
+        """
+        self._check_lattice_version()
+        if voxels is None:
+            ids = np.arange(len(self.coords))
+        else:
+            ids = np.array([self.lattice.get_voxel(v).id for v in voxels], dtype=int)
+
+        return self.gather(self.coords[ids], self.offsets, self.lattice.dimensions, self.cargo_grid, self.cargo_coords_grid)
+
+    @staticmethod
+    def gather(coords: np.ndarray, offsets: np.ndarray, dimensions: tuple[int, int, int],
+               cargo_grid: np.ndarray, cargo_coords_grid: np.ndarray) -> np.ndarray:
+        """batch_surroundings of the voxels at the (n, 3) coords, straight from the lattice grids"""
+        # convert voxel_surr coords into flat indices into the original lattice,
+        # wrapping around its periodic boundaries
+        points = coords[:, None, :] + offsets[None, :, :]
+        flat = np.ravel_multi_index(tuple(np.moveaxis(points, -1, 0)), dimensions, mode='wrap')
+
+        surr = np.empty((*flat.shape, 4))
+        # translate each coordinate a little for the accurate surroundings
+        surr[..., :3] = offsets + np.take(cargo_coords_grid.reshape(-1, 3), flat, axis=0)
+        surr[..., 3] = np.take(cargo_grid, flat)
+        return surr
+
+    @staticmethod
+    def as_dict(surr: np.ndarray) -> dict[tuple[float, float, float], int]:
+        """one voxel's (cube, 4) batch_surroundings as a surroundings dict (coords: cargo)"""
+        return dict(zip(map(tuple, surr[:, :3].tolist()), surr[:, 3].astype(int).tolist()))
+
+    def voxel_surroundings(self, voxel) -> dict[tuple[float, float, float], int]:
+        """
+        create a cube of surrounding particles all oriented wrt. where 
+        v.cargo_coords would be (memoized per voxel). Legacy dict API, symmetry
+        is decided on dense_surroundings / sparse_surroundings
+        """
+        self._check_lattice_version()
+        v_id = self.lattice.get_voxel(voxel).id
+
+        surr = self.surr_cache.get(v_id)
+        if surr is not None:
+            self.cache_hits += 1
+            return surr
+
+        self.cache_misses += 1
+        surr = self.as_dict(self.batch_surroundings([v_id])[0])
+        self.surr_cache[v_id] = surr
         return surr
+
+    def rotated_surroundings(self, voxel, rotation) -> dict[tuple[float, float, float], int]:
+        """
+        the surroundings of the voxel rotated by the supplied rotation
+        (memoized per (voxel, rotation) pair). Legacy dict API, like voxel_surroundings
+        """
+        self._check_lattice_version()
+        key = (self.lattice.get_voxel(voxel).id, rotation)
+
+        rot_surr = self.rot_surr_cache.get(key)
+        if rot_surr is not None:
+            self.cache_hits += 1
+            return rot_surr
+
+        self.cache_misses += 1
+        rot_surr = self.rotate(self.voxel_surroundings(voxel), rotation)
+        self.rot_surr_cache[key] = rot_surr
+        return rot_surr
     
 
     def rotate(self, surr_dict: dict[tuple[float, float, float], int], rotation) -> dict[tuple[float, float, float], int]:
         """
         accepts a surroundings dictionary (coords: cargo) and rotates each coordinate 
-        based on the supplied rotation function
+        based on the supplied rotation, either a RotationGroup element (index / label)
+        or a rotation function
         """
         # convert coords and materials to their own np.arrays
         surr_keys = np.array(list(surr_dict.keys()))
         surr_values = list(surr_dict.values())
 
         # apply rotation
-        rot_surr_keys = rotation(surr_keys)
-        rot_surr_keys = np.round(rot_surr_keys, 2)
-        rot_surr = {tuple(key): value for key, value in zip(rot_surr_keys, surr_values)}
+        if callable(rotation):
+            rot_surr_keys = rotation(surr_keys)
+            rot_surr_keys = np.round(rot_surr_keys, 2)
+        else: # integer matrices only permute / negate coords, so no rounding needed
+            rot_surr_keys = self.rotation_group.rotate(surr_keys, rotation)
+        rot_surr = {tuple(key): value for key, value in zip(rot_surr_keys.tolist(), surr_values)}
 
         return rot_surr
 
@@ -78,4 +484,4 @@ if __name__ == "__main__":
     surr = Surroundings(lattice)
     v0_surr = surr.voxel_surroundings(0)
 
-    print(v0_surr)
\ No newline at end of file
+    print(v0_surr)
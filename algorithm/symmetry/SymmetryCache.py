@@ -0,0 +1,110 @@
+import hashlib
+import logging
+import os
+import tempfile
+import numpy as np
+from pathlib import Path
+
+class SymmetryCache:
+    """
+    On-disk cache of computed symmetry tables, one compressed .npz file per lattice,
+    keyed by a hash of the lattice contents (coords, cargo, cargo_coords, unit cell flag).
+
+    Files are stamped with VERSION, so bumping it whenever the way symmetries are
+    computed changes makes all older files misses. The least recently used files are
+    evicted once the directory grows past max_bytes.
+
+    The cache is off unless asked for (enabled=True), so a plain Moses / SymmetryDf never
+    writes into the home directory. MOSES_CACHE=1 turns it on wherever it isn't set
+    explicitly, MOSES_CACHE=0 turns it off everywhere, and the directory defaults to
+    $MOSES_CACHE_DIR (or ~/.cache/moses).
+    """
+    VERSION = 4
+
+    def __init__(self, directory: str|os.PathLike=None, max_bytes: int=512*2**20, enabled: bool=None):
+        if directory is None:
+            directory = os.environ.get("MOSES_CACHE_DIR", Path.home() / ".cache" / "moses")
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        env = os.environ.get("MOSES_CACHE")
+        if enabled is None:
+            enabled = env == "1"
+        self.enabled = enabled and env != "0"
+        self.hits = self.misses = 0
+
+    def key(self, lattice) -> str:
+        """content hash of the lattice (+ the cache version)"""
+        h = hashlib.blake2b(digest_size=20)
+        h.update(f"v{self.VERSION}|unit_cell={bool(lattice.is_unit_cell)}|dims={tuple(lattice.dimensions)}".encode())
+        for array in (lattice.coords, lattice.cargo, lattice.cargo_coords):
+            array = np.ascontiguousarray(array)
+            h.update(f"|{array.dtype.str}{array.shape}".encode())
+            h.update(array.tobytes())
+        return h.hexdigest()
+
+    def path(self, key: str) -> Path:
+        return self.directory / f"symmetry-{key}.npz"
+
+    def load(self, lattice) -> dict[str, np.ndarray]|None:
+        """the arrays cached for the lattice, or None on a miss"""
+        if not self.enabled:
+            return None
+        path = self.path(self.key(lattice))
+        try:
+            with np.load(path) as data:
+                if int(data["version"]) != self.VERSION:
+                    raise ValueError(f"cache version {int(data['version'])} != {self.VERSION}")
+                arrays = {name: data[name] for name in data.files if name != "version"}
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except Exception as e: # unreadable / stale file, recompute and overwrite it
+            logging.warning(f"ignoring symmetry cache file {path}: {e}")
+            self.misses += 1
+            return None
+
+        os.utime(path) # mark as recently used for eviction
+        self.hits += 1
+        return arrays
+
+    def save(self, lattice, **arrays: np.ndarray):
+        """store the arrays for the lattice, then evict old files if over max_bytes"""
+        if not self.enabled:
+            return
+        path = self.path(self.key(lattice))
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            # write to a temp file first, so readers never see half a file
+            fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                np.savez_compressed(f, version=np.array(self.VERSION), **arrays)
+            os.replace(tmp, path)
+        except OSError as e:
+            logging.warning(f"could not write symmetry cache file {path}: {e}")
+            return
+        self.evict()
+
+    def evict(self):
+        """delete the least recently used files until the cache fits in max_bytes"""
+        files = []
+        for path in self.directory.glob("symmetry-*.npz"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_bytes:
+                break
+            try:
+                path.unlink()
+            except OSError:
+                continue
+            total -= size
+
+    def clear(self):
+        """delete every cached file"""
+        for path in self.directory.glob("symmetry-*.npz"):
+            path.unlink(missing_ok=True)
@@ -1,8 +1,13 @@
+import numpy as np
 import pandas as pd
 import logging
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
 
 from algorithm.lattice.Voxel import Voxel
-from algorithm.symmetry.Rotation import RotationDict
+from algorithm.symmetry.SymmetryTensor import SymmetryTensor, LazySymmetryTensor
+from algorithm.symmetry.Fingerprint import Fingerprints
+from algorithm.symmetry.SymmetryCache import SymmetryCache
 
 # useful class for making symmetry_df labels
 class VoxelPair:
@@ -62,25 +67,106 @@ class VoxelPair:
         return voxel2_id if voxel_id == voxel1_id else voxel1_id
 
 
+# --- process pool helpers for SymmetryDf.compute_all_symmetries_parallel ---
+def _share(array: np.ndarray) -> tuple[SharedMemory, np.ndarray]:
+    """copy an array into a new shared memory block"""
+    shm = SharedMemory(create=True, size=max(array.nbytes, 1))
+    shared = np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)
+    shared[...] = array
+    return shm, shared
+
+def _symmetry_worker(spec: dict[str, tuple[str, tuple, str]], rows: list[tuple[int, np.ndarray]]) -> None:
+    """
+    fill the symmetry masks of the pairs (i, j) for each (i, js) row, exactly like
+    SymmetryDf.compute_all_symmetries does, reading the surroundings from shared memory
+    """
+    from algorithm.symmetry.Surroundings import Surroundings
+
+    blocks = {name: SharedMemory(name=shm_name) for name, (shm_name, _, _) in spec.items()}
+    try:
+        arrays = {
+            name: np.ndarray(shape, dtype=np.dtype(dtype), buffer=blocks[name].buf)
+            for name, (_, shape, dtype) in spec.items()
+        }
+        masks = arrays["masks"]
+
+        for i, js in rows:
+            row_masks = Surroundings.match_arrays(arrays, i, js)
+            masks[i, js] |= row_masks
+            masks[js, i] |= row_masks
+    finally:
+        for shm in blocks.values():
+            shm.close()
+
+
 class SymmetryDf:
     """class storing all combinations of voxel pairs and their symmetries"""
     
-    def __init__(self, lattice, surroundings):
+    MODES = ("eager", "lazy")
+
+    def __init__(self, lattice, surroundings, mode: str="eager", cache_size: int=100_000, n_workers: int=1,
+                 cache: SymmetryCache|bool=None, precomputed: dict[str, np.ndarray]=None):
+        """
+        Args:
+            mode: "eager" computes the symmetries of every voxel pair up front,
+                "lazy" only computes a pair the first time it's asked for
+            cache_size: max number of voxel pairs kept in memory in lazy mode
+            n_workers: number of processes computing the symmetries in eager mode
+            cache: on-disk SymmetryCache to reuse results of identical lattices from
+                (True = the default cache, False = off, None = only if MOSES_CACHE=1)
+            precomputed: "masks" and / or "fingerprints" already computed for this lattice
+                (as from SymmetryCache or fingerprint_array), used as is instead of the cache
+        """
         from algorithm.lattice.Lattice import Lattice
+        if mode not in self.MODES:
+            raise ValueError(f"invalid symmetry mode: {mode} (expected one of {self.MODES})")
+
         # important references
         self.lattice: Lattice = lattice
         self.surroundings = surroundings
+        self.mode = mode
+        self.n_workers = n_workers
+
+        # the 24 distinct rotations of the cube, indexed 0..23 as symmetry operations
+        self.rotation_group = self.surroundings.rotation_group
 
         # create dictionary of all possible symmetry operations
-        # eg: {'90° X-axis': lambda x: np.rot90(x, 1, (0, 1)), ...}
-        self.symmetry_operations = RotationDict().all_rotations
-        
-        # the essential data structure containing all voxel pairs and their symmetries
-        # eg: (0, 1): {'90° X-axis': True, '180° Y-axis': False, ...}
-        self.symmetry_df = self.init_symmetry_df()
+        # eg: {'90° X-axis': lambda x: x @ [[1, 0, 0], [0, 0, 1], [0, -1, 0]], ...}
+        self.symmetry_operations = {
+            label: self.rotation_group.rotation(k) for k, label in enumerate(self.rotation_group.labels)
+        }
+
+        # reuse whatever was computed for an identical lattice before
+        self.cache = cache if isinstance(cache, SymmetryCache) else SymmetryCache(enabled=cache)
+        cached = precomputed if precomputed is not None else (self.cache.load(self.lattice) or {})
+        if any(len(array) != len(self.lattice.voxels) for array in cached.values()):
+            cached = {} # (can only happen on a hash collision)
 
-        # fill all symmetries in place
-        self.compute_all_symmetries()
+        # hash the canonical surroundings of each voxel to find the equivalence classes,
+        # voxels in different classes can never have symmetry with each other
+        fingerprints = [fp.tobytes() for fp in cached["fingerprints"]] if "fingerprints" in cached else None
+        self.fingerprints = Fingerprints(self.lattice, self.surroundings, self.rotation_group, fingerprints)
+        self.classes = self.fingerprints.classes
+
+        # the essential data structure containing all voxel pairs and their symmetries,
+        # packed into one bitmask per pair (see SymmetryTensor)
+        # eg: masks[0, 1] -> {'90° X-axis': True, '180° Y-axis': False, ...}
+        if mode == "lazy":
+            self.symmetries = LazySymmetryTensor(
+                len(self.lattice.voxels), list(self.symmetry_operations.keys()), self.compute_symmetry_mask,
+                self.classes, self.fingerprints.class_members, max_pairs=cache_size
+            )
+        else:
+            self.symmetries = self.init_symmetry_tensor()
+            # fill all symmetries in place
+            if "masks" in cached: # (not copied, so precomputed masks can be shared)
+                self.symmetries.masks = cached["masks"]
+            else:
+                if n_workers > 1:
+                    self.compute_all_symmetries_parallel(n_workers)
+                else:
+                    self.compute_all_symmetries()
+                self.cache.save(self.lattice, masks=self.symmetries.masks, fingerprints=self.fingerprint_array())
     
 
     # --- useful functions for painter --- 
@@ -105,17 +191,19 @@ class SymmetryDf:
             symlist: List of symmetry labels that are valid for the voxel pair
                 -> eg: ['90° X-axis', '180° Y-axis']
         """
-        voxel1_id = self.lattice.get_voxel(voxel1).id
-        voxel2_id = self.lattice.get_voxel(voxel2).id
-        voxel_pair_label = VoxelPair.make_label(frozenset([voxel1_id, voxel2_id]))
-
-        # get those symmetries which are True for the voxel pair
-        all_symmetries = self.symmetry_df.loc[voxel_pair_label]
-        valid_symmetries = all_symmetries[all_symmetries==True].index
-        symlist = list(valid_symmetries)
+        return self.symmetries.symlist(self._id(voxel1), self._id(voxel2))
 
-        return symlist
+    def symops(self, voxel1, voxel2) -> tuple[int, ...]:
+        """same as symlist, but as RotationGroup indices instead of labels"""
+        return self.symmetries.symops(self._id(voxel1), self._id(voxel2))
     
+    def first_symops(self, voxels1: np.ndarray, voxels2: np.ndarray) -> np.ndarray:
+        """
+        first entry of symops(voxels1[n], voxels2[n]) for many voxel.id pairs at once
+        (-1 for pairs without symmetry)
+        """
+        return self.symmetries.first_ops(np.asarray(voxels1, dtype=int), np.asarray(voxels2, dtype=int))
+
     def get_symvoxels(self, voxel: int) -> list[int]:
         """
         Return a list of all other voxels in the lattice which the supplied voxel 
@@ -124,60 +212,92 @@ class SymmetryDf:
         Args:
             voxel: Voxel or id (int) of what voxel we want to get the symvoxels for
         """
-        voxel_id = self.lattice.get_voxel(voxel).id
-        symdict = self.symdict(voxel_id)
-        symvoxels = [sv for sv in symdict.keys()]
-        return symvoxels
-    
+        return [int(sv) for sv in self.symmetries.symvoxels(self._id(voxel))]
+
     # --- logic / internal ---
-    def init_symmetry_df(self) -> pd.DataFrame:
+    def _id(self, voxel) -> int:
+        """voxel.id of a Voxel / id without going through the lattice if we can help it"""
+        if isinstance(voxel, Voxel):
+            return voxel.id
+        if isinstance(voxel, (int, np.integer)):
+            return int(voxel)
+        return self.lattice.get_voxel(voxel).id
+
+    def init_symmetry_tensor(self) -> SymmetryTensor:
         """
-        Initialize an empty symmetry_df with all possible voxel pairs as the index, with 
-        empty columns corresponding symmetry operations to be filled later.
+        Initialize an empty symmetry tensor for all possible voxel pairs, with one bit 
+        per symmetry operation to be filled later.
         """
-        # create a list of all possible voxel pairs
-        voxel_pairs_set = set()
-        for voxel1 in self.lattice.voxels:
-            for voxel2 in self.lattice.voxels:
-                voxel_pairs_set.add(frozenset([voxel1.id, voxel2.id]))
-        
-        # convert the set of frozensets to a list of formatted strings
-        # eg, "frozenset({0, 1})" -> "(0, 1)"
-        sorted_voxel_pairs_set = sorted(voxel_pairs_set) # Sort lexicographically
-        voxel_pairs = [VoxelPair.make_label(pair) for pair in sorted_voxel_pairs_set]
-        symmetry_df = pd.DataFrame(index=voxel_pairs, columns=self.symmetry_operations.keys())
-        return symmetry_df
+        return SymmetryTensor(len(self.lattice.voxels), list(self.symmetry_operations.keys()))
     
     def compute_all_symmetries(self):
         """just compute all pair-wise symmetries between voxels in the lattice"""
-        for sym_label, sym_func in self.symmetry_operations.items():
+        # two voxels are symmetric if their surroundings are the same after one is transformed,
+        # ie. the rotated cube cells of one hold the same cargo (+ rotated cargo_coords) as the other
+        class_members = self.fingerprints.class_members
+        for i in range(len(self.lattice.voxels)):
+
+            # loop through all voxel pairs within the same equivalence class, each unordered
+            # pair only once (pairs across classes are left without symmetry)
+            members = class_members[self.classes[i]]
+            js = members[members >= i]
+            row_masks = self.surroundings.symmetry_masks(i, js)
+            self.symmetries.masks[i, js] |= row_masks
+            self.symmetries.masks[js, i] |= row_masks
 
-            # loop through all possible voxel pairs
-            for voxel1 in self.lattice.voxels:
 
-                # transform surroundings of voxel1 once per symmetry
-                surr1 = self.surroundings.voxel_surroundings(voxel1)
-                rot_surr1 = self.surroundings.rotate(surr1, sym_func)
+    def compute_all_symmetries_parallel(self, n_workers: int):
+        """
+        compute_all_symmetries sharded by voxel1 across a process pool. The dense surroundings
+        and the symmetry masks live in shared memory, and each worker only writes the
+        pairs (i, j >= i) of its own voxel1 rows (and their mirrors), so there are no races
+        """
+        # shard the rows round-robin, since the number of pairs per row shrinks with i
+        class_members = self.fingerprints.class_members
+        rows = [(i, members[members >= i]) for i in range(len(self.lattice.voxels))
+                for members in [class_members[self.classes[i]]]]
+        n_shards = min(len(rows), 4*n_workers)
+        shards = [rows[s::n_shards] for s in range(n_shards)]
+
+        shared = {}
+        try:
+            for name, array in [*self.surroundings.shared_arrays().items(), ("masks", self.symmetries.masks)]:
+                shared[name] = _share(array)
+            spec = {name: (shm.name, array.shape, array.dtype.str) for name, (shm, array) in shared.items()}
 
-                for voxel2 in self.lattice.voxels:
-                    # make voxel pair label (str) to index into SymmetryDf
-                    voxel_pair_label = VoxelPair.make_label(frozenset([voxel1.id, voxel2.id])) 
+            with ProcessPoolExecutor(max_workers=n_workers) as pool:
+                futures = [pool.submit(_symmetry_worker, spec, shard) for shard in shards]
+                for future in futures:
+                    future.result() # re-raise anything that went wrong in a worker
 
-                    # skip if symmetry has already been computed
-                    symmetry_already_computed = not pd.isna(self.symmetry_df.loc[voxel_pair_label, sym_label])
-                    if symmetry_already_computed:
-                        continue
+            self.symmetries.masks[:] = shared["masks"][1]
+        finally:
+            for shm, _ in shared.values():
+                shm.close()
+                shm.unlink()
 
-                    # CHECK SYMMETRY:
-                    # two voxels are symmetric if their surroundings are the same after one is transformed
-                    surr2 = self.surroundings.voxel_surroundings(voxel2)
-                    
-                    if set(surr2.keys()) == set(rot_surr1.keys()):
-                        has_symmetry = all(surr2[key] == rot_surr1[key] for key in surr2.keys())
-                    else:
-                        has_symmetry = False
+    def fingerprint_array(self) -> np.ndarray:
+        """the voxel fingerprints as an (N, digest size) uint8 array"""
+        return np.frombuffer(b"".join(self.fingerprints.fingerprints), dtype=np.uint8).reshape(
+            len(self.fingerprints.fingerprints), Fingerprints.DIGEST_SIZE
+        )
 
-                    self.symmetry_df.loc[voxel_pair_label, sym_label] = has_symmetry
+    def compute_symmetry_mask(self, i: int, j: int) -> int:
+        """bitmask of all symmetry operations mapping the surroundings of voxel i onto voxel j"""
+        return int(self.surroundings.symmetry_masks(i, [j])[0])
+
+    def cache_info(self) -> dict[str, int]:
+        """
+        how many voxel pairs were computed (and cache stats in lazy mode), and how many
+        were ruled out up front by the signatures / fingerprints
+        """
+        if self.mode == "lazy":
+            info = self.symmetries.cache_info()
+        else:
+            pairs_total = len(self.lattice.voxels) * (len(self.lattice.voxels) + 1) // 2
+            pairs_touched = sum(len(m) * (len(m) + 1) // 2 for m in self.fingerprints.class_members)
+            info = {"pairs_touched": pairs_touched, "pairs_total": pairs_total}
+        return {**info, **self.fingerprints.filter_info()}
 
 
     # --- info / print functions ---
@@ -196,28 +316,36 @@ class SymmetryDf:
         >   {0: ['90° X-axis', '180° Y-axis'],
              4: ['90° Z-axis', '270° X-axis']}
         """
-        voxel_id = voxel.id if isinstance(voxel, Voxel) else voxel
+        voxel_id = self._id(voxel)
         symdict = {}
-        for voxel2 in self.lattice.voxels.values():
-            current_symlist = self.symlist(voxel_id, voxel2.id)
-            # only add symlists for voxel pairs with valid symmetries
-            if len(current_symlist) > 0:
-                # voxel_pair_label = VoxelPair.make_label(frozenset([id, voxel2.id]))
-                symdict[voxel2.id] = current_symlist
+        # only voxel pairs with valid symmetries have a non-zero mask
+        for voxel2_id in self.symmetries.symvoxels(voxel_id):
+            symdict[int(voxel2_id)] = self.symmetries.symlist(voxel_id, voxel2_id)
         return symdict
     
+    @property
+    def symmetry_df(self) -> pd.DataFrame:
+        """
+        The legacy pandas view of the symmetry table, one row per voxel pair label
+        (eg, "(0, 1)") and one boolean column per symmetry operation.
+        Built on request from the packed masks, so don't use it in hot loops.
+        """
+        masks = self.symmetries.masks
+        n_ops = len(self.symmetries.labels)
+        rows, cols = np.triu_indices(len(masks))
+        bits = (masks[rows, cols, None] >> np.arange(n_ops, dtype=np.uint64)) & np.uint64(1)
+
+        voxel_pairs = [VoxelPair.make_label(frozenset([int(i), int(j)])) for i, j in zip(rows, cols)]
+        return pd.DataFrame(bits.astype(bool), index=voxel_pairs, columns=self.symmetries.labels)
+    
     def print_all_symdicts(self) -> None:
         """
         Auxiliary function to print all possible symdicts for all voxels in the Lattice.MinDesign
         (Not used in actual algorithm, only for testing)
         """
-        for voxel in self.lattice.voxels.values():
-            print(f'Voxel {voxel.id}\n---\nCoordinates: {voxel.coordinates} Material: {voxel.material}')
+        for voxel in self.lattice.voxels:
+            print(f'Voxel {voxel.id}\n---\nCoordinates: {voxel.coords} Material: {voxel.cargo}')
             print('Symmetries:')
             for voxel_pair, symlist in self.symdict(voxel.id).items():
                 print(f'{voxel_pair}: {symlist}')
-            print('\n')
-
-
-
-    
+            print('\n')
\ No newline at end of file
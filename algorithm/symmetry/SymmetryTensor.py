@@ -0,0 +1,174 @@
+from collections import OrderedDict
+from typing import Callable
+
+import numpy as np
+
+class SymmetryTensor:
+    """
+    Dense NumPy store of all pair-wise voxel symmetries. Every (voxel1.id, voxel2.id)
+    pair holds a single uint64 bitmask, where bit k is set if symmetry operation k maps
+    the surroundings of voxel1 onto voxel2. This is the N x N x n_ops boolean table
+    bit-packed along the operation axis.
+    """
+    MAX_OPS = 64
+
+    def __init__(self, n_voxels: int, labels: list[str]):
+        if len(labels) > self.MAX_OPS:
+            raise ValueError(f"cannot pack {len(labels)} symmetry operations into a uint64 mask")
+
+        self.n_voxels = n_voxels
+        self.labels = list(labels)
+        self.label_index = {label: k for k, label in enumerate(self.labels)}
+
+        # the essential data structure: masks[i, j] = bitmask of valid operations
+        self.masks = np.zeros((n_voxels, n_voxels), dtype=np.uint64)
+
+        # decoded masks are shared between many pairs, so only decode each once
+        self._decoded: dict[int, tuple[int, ...]] = {0: ()}
+
+    # --- writing ---
+    def set_symmetry(self, i: int, j: int, k: int, value: bool=True):
+        """set (or clear) operation k for the pair (i, j) and its mirror (j, i)"""
+        bit = np.uint64(1 << k)
+        if value:
+            self.masks[i, j] |= bit
+            self.masks[j, i] |= bit
+        else:
+            self.masks[i, j] &= ~bit
+            self.masks[j, i] &= ~bit
+
+    def set_mask(self, i: int, j: int, mask: int):
+        """overwrite the full bitmask of the pair (i, j) and its mirror (j, i)"""
+        self.masks[i, j] = mask
+        self.masks[j, i] = mask
+
+    # --- reading ---
+    def mask(self, i: int, j: int) -> int:
+        return int(self.masks[i, j])
+
+    def has_symmetry(self, i: int, j: int) -> bool:
+        return self.masks[i, j] != 0
+
+    def symops(self, i: int, j: int) -> tuple[int, ...]:
+        """indices of all valid symmetry operations for the pair (i, j)"""
+        mask = int(self.masks[i, j])
+        ops = self._decoded.get(mask)
+        if ops is None:
+            ops = tuple(k for k in range(len(self.labels)) if mask >> k & 1)
+            self._decoded[mask] = ops
+        return ops
+
+    def symlist(self, i: int, j: int) -> list[str]:
+        """labels of all valid symmetry operations for the pair (i, j)"""
+        return [self.labels[k] for k in self.symops(i, j)]
+
+    def symvoxels(self, i: int) -> np.ndarray:
+        """ids of all voxels which voxel i has at least one symmetry with"""
+        return np.flatnonzero(self.masks[i])
+
+    def first_ops(self, i: np.ndarray, j: np.ndarray) -> np.ndarray:
+        """the first valid operation of each pair (i[n], j[n]), or -1 if it has no symmetry"""
+        masks = self.masks[i, j]
+        bits = (masks[:, None] >> np.arange(len(self.labels), dtype=np.uint64)) & np.uint64(1)
+        return np.where(masks != 0, bits.argmax(axis=1), -1)
+
+
+class LazySymmetryTensor(SymmetryTensor):
+    """
+    Same interface as SymmetryTensor, but each pair's bitmask is only computed the first
+    time it's asked for (by compute_mask(i, j), with i <= j) and kept in a bounded LRU cache.
+    Pairs in different equivalence classes never have symmetry, so they aren't computed at all.
+    """
+    def __init__(self, n_voxels: int, labels: list[str], compute_mask: Callable[[int, int], int],
+                 classes: np.ndarray, class_members: list[np.ndarray], max_pairs: int=100_000):
+        if len(labels) > self.MAX_OPS:
+            raise ValueError(f"cannot pack {len(labels)} symmetry operations into a uint64 mask")
+
+        self.n_voxels = n_voxels
+        self.labels = list(labels)
+        self.label_index = {label: k for k, label in enumerate(self.labels)}
+        self._decoded: dict[int, tuple[int, ...]] = {0: ()}
+
+        self.compute_mask = compute_mask
+        self.classes = classes
+        self.class_members = class_members
+        self.max_pairs = max_pairs
+
+        # (i, j) -> mask of the most recently used pairs (i <= j), oldest first
+        self.cache: OrderedDict[tuple[int, int], int] = OrderedDict()
+        # every pair computed so far, to report how much of the table was actually needed
+        self.touched: set[tuple[int, int]] = set()
+        self.hits = self.misses = self.evictions = 0
+
+    @property
+    def masks(self) -> np.ndarray:
+        """the full (N, N) table, computing every missing pair (expensive, only for inspection)"""
+        masks = np.zeros((self.n_voxels, self.n_voxels), dtype=np.uint64)
+        for members in self.class_members:
+            for i in members:
+                for j in members[members >= i]:
+                    masks[i, j] = masks[j, i] = self.mask(i, j)
+        return masks
+
+    # --- writing ---
+    def set_mask(self, i: int, j: int, mask: int):
+        self._store((min(i, j), max(i, j)), int(mask))
+
+    def set_symmetry(self, i: int, j: int, k: int, value: bool=True):
+        mask = self.mask(i, j)
+        self.set_mask(i, j, mask | (1 << k) if value else mask & ~(1 << k))
+
+    def _store(self, key: tuple[int, int], mask: int):
+        self.cache[key] = mask
+        self.cache.move_to_end(key)
+        while len(self.cache) > self.max_pairs:
+            self.cache.popitem(last=False)
+            self.evictions += 1
+
+    # --- reading ---
+    def mask(self, i: int, j: int) -> int:
+        i, j = int(i), int(j)
+        if self.classes[i] != self.classes[j]:
+            return 0
+        key = (min(i, j), max(i, j))
+        mask = self.cache.get(key)
+        if mask is not None:
+            self.hits += 1
+            self.cache.move_to_end(key)
+            return mask
+
+        self.misses += 1
+        self.touched.add(key)
+        mask = self.compute_mask(*key)
+        self._store(key, mask)
+        return mask
+
+    def has_symmetry(self, i: int, j: int) -> bool:
+        return self.mask(i, j) != 0
+
+    def symops(self, i: int, j: int) -> tuple[int, ...]:
+        mask = self.mask(i, j)
+        ops = self._decoded.get(mask)
+        if ops is None:
+            ops = tuple(k for k in range(len(self.labels)) if mask >> k & 1)
+            self._decoded[mask] = ops
+        return ops
+
+    def symvoxels(self, i: int) -> np.ndarray:
+        members = self.class_members[self.classes[i]]
+        return np.array([j for j in members if self.mask(i, j)], dtype=int)
+
+    def first_ops(self, i: np.ndarray, j: np.ndarray) -> np.ndarray:
+        ops = [self.symops(a, b) for a, b in zip(np.asarray(i).tolist(), np.asarray(j).tolist())]
+        return np.array([o[0] if o else -1 for o in ops], dtype=int)
+
+    def cache_info(self) -> dict[str, int]:
+        """cache hits / misses / evictions, and how many of the N(N+1)/2 pairs were computed"""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size": len(self.cache),
+            "pairs_touched": len(self.touched),
+            "pairs_total": self.n_voxels * (self.n_voxels + 1) // 2
+        }
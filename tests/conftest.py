@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# the algorithm package is imported from the repo root, as in app.py
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
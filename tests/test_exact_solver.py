@@ -0,0 +1,98 @@
+import random
+
+import numpy as np
+import pytest
+
+from algorithm.lattice.Voxel import Voxel, BOND_TYPE_CODES
+from algorithm.lattice.Lattice import Lattice
+from algorithm.Moses import Moses
+
+ORIENTATIONS = [(0, 0, 0), (0.3, 0, 0), (-0.3, 0, 0), (0, 0.3, 0), (0, 0, -0.5)]
+
+def random_lattice(seed: int, dims: tuple[int, int, int]) -> Lattice:
+    rng = random.Random(seed)
+    voxels = [
+        Voxel(coords=(x, y, z), cargo=rng.choice([0, 1, 1, 2]), cargo_coords=rng.choice(ORIENTATIONS))
+        for x in range(dims[0]) for y in range(dims[1]) for z in range(dims[2])
+    ]
+    return Lattice(voxels, is_unit_cell=False)
+
+def nb1_lattice() -> Lattice:
+    coords = [(0,0,0), (1,0,0), (0,1,0), (1,1,0), (0,0,1), (1,0,1), (0,1,1), (1,1,1)]
+    orientations = [(0.3,0,0), (0,0.3,0), (-0.3,0,0), (0,-0.3,0), (0,0.3,0), (-0.3,0,0), (0,-0.3,0), (0.3,0,0)]
+    return Lattice([Voxel(coords=c, cargo=1, cargo_coords=o) for c, o in zip(coords, orientations)], is_unit_cell=False)
+
+def structural_bond_classes(lattice: Lattice) -> int:
+    """number of distinct pairs of different species (id2's up to sign) joined by a painted structural bond"""
+    id2 = np.abs(lattice.id2)
+    structural = (lattice.bond_type == BOND_TYPE_CODES["structural"]) & (lattice.bond_color != 0)
+    v, i = np.nonzero(structural)
+    pairs = np.sort(np.column_stack([id2[v], id2[lattice.partner[v, i]]]), axis=1)
+    return len({tuple(pair) for pair in pairs.tolist() if pair[0] != pair[1]})
+
+def palindromic_voxels(lattice: Lattice) -> int:
+    """voxels with a color and its complement on their bonds to other id2's (an id2 may bond to itself that way)"""
+    count = 0
+    for v_id in range(len(lattice.voxels)):
+        colors = lattice.bond_color[v_id]
+        others = (lattice.id2[lattice.partner[v_id]] != lattice.id2[v_id]) & (colors != 0)
+        colors = set(colors[others].tolist())
+        count += any(-c in colors for c in colors)
+    return count
+
+def inconsistent_voxels(moses: Moses) -> int:
+    """voxels whose colors aren't the colors of the first voxel with their id2, under any symmetry of the two"""
+    lattice = moses.lattice
+    perms = moses.symmetry_df.rotation_group.vertex_permutations
+    prototypes: dict[int, int] = {}
+    count = 0
+    for v_id in range(len(lattice.voxels)):
+        p_id = prototypes.setdefault(int(lattice.id2[v_id]), v_id)
+        count += not any(
+            np.array_equal(lattice.bond_color[v_id, perms[g]], lattice.bond_color[p_id])
+            for g in moses.symmetry_df.symops(p_id, v_id)
+        )
+    return count
+
+LATTICES = {
+    "nb1": nb1_lattice,
+    "random_4x2x2": lambda: random_lattice(7, (4, 2, 2)),
+    "random_3x3x1": lambda: random_lattice(3, (3, 3, 1)), # self-bonded along z
+    "random_4x4x1": lambda: random_lattice(4, (4, 4, 1)),
+}
+
+@pytest.mark.parametrize("name", LATTICES)
+def test_exact_keeps_bond_classes_apart(name):
+    moses = Moses(LATTICES[name](), symmetry_cache=False)
+    moses.run()
+    greedy_colors = moses.n_colors
+    greedy_unpainted = int(np.count_nonzero(moses.lattice.bond_color == 0))
+
+    info = moses.run_exact(time_limit=2.0)
+
+    n_unpainted = int(np.count_nonzero(moses.lattice.bond_color == 0))
+    assert info["n_colors"] == moses.n_colors
+    assert info["n_unpainted"] == n_unpainted
+    assert moses.n_colors >= structural_bond_classes(moses.lattice)
+    # never worse than MOSES, and only repainted when strictly fewer colors
+    assert n_unpainted <= greedy_unpainted
+    assert moses.n_colors <= greedy_colors
+    assert info["improved"] == (moses.n_colors < greedy_colors)
+    # every bond is still complementary to its partner
+    partner_colors = moses.lattice.bond_color[moses.lattice.partner, np.array(Voxel.OPPOSITE)]
+    assert np.array_equal(moses.lattice.bond_color, -partner_colors)
+    if info["improved"]: # the MILP coloring keeps the mesovoxel, without palindromes
+        assert palindromic_voxels(moses.lattice) == 0
+        assert inconsistent_voxels(moses) == 0
+
+def test_exact_proves_optimality():
+    moses = Moses(nb1_lattice(), symmetry_cache=False)
+    moses.run()
+    info = moses.run_exact(time_limit=30.0)
+
+    assert info["optimal"] and info["improved"]
+    assert info["gap"] == pytest.approx(0)
+    assert info["moses_gap"] > 0 # MOSES' 8 colors weren't optimal
+    assert moses.n_colors == 2 >= structural_bond_classes(moses.lattice)
+    assert palindromic_voxels(moses.lattice) == 0
+    assert inconsistent_voxels(moses) == 0
@@ -0,0 +1,115 @@
+import random
+from collections import deque
+
+import numpy as np
+import pytest
+
+from algorithm.lattice.Voxel import Voxel
+from algorithm.lattice.Lattice import Lattice
+from algorithm.Moses import Moses
+
+def checkered_lattice() -> Lattice:
+    """a 3x3x3 lattice with a 2x2 block of oppositely oriented cargo in each layer (needs complementary voxels)"""
+    orientations = {(0,0): (1,1,0), (1,0): (-1,1,0), (0,1): (1,-1,0), (1,1): (-1,-1,0)}
+    voxels = [
+        Voxel(coords=(x, y, z), cargo=int((x, y) in orientations), cargo_coords=orientations.get((x, y), (0,0,0)))
+        for z in range(3) for y in range(3) for x in range(3)
+    ]
+    return Lattice(voxels, is_unit_cell=False)
+
+def nb1_lattice() -> Lattice:
+    coords = [(0,0,0), (1,0,0), (0,1,0), (1,1,0), (0,0,1), (1,0,1), (0,1,1), (1,1,1)]
+    orientations = [(0.3,0,0), (0,0.3,0), (-0.3,0,0), (0,-0.3,0), (0,0.3,0), (-0.3,0,0), (0,-0.3,0), (0.3,0,0)]
+    return Lattice([Voxel(coords=c, cargo=1, cargo_coords=o) for c, o in zip(coords, orientations)], is_unit_cell=False)
+
+def sample_lattice() -> Lattice:
+    """the 2x2x2 oriented sample lattice of the Surroundings demo"""
+    cargo_coords = [(0,0,0), (0,0,-0.5), (0,0,-0.5), (0,0,0), (0,0,0.5), (0,0,0), (0,0,0), (0,0,0.5)]
+    coords = [(0,0,0), (1,0,0), (0,1,0), (1,1,0), (0,0,1), (1,0,1), (0,1,1), (1,1,1)]
+    return Lattice([Voxel(coords=c, cargo=1 + c[2], cargo_coords=o) for c, o in zip(coords, cargo_coords)], is_unit_cell=False)
+
+def random_lattice(seed: int, dims: tuple[int, int, int]) -> Lattice:
+    rng = random.Random(seed)
+    orientations = [(0,0,0), (0.3,0,0), (-0.3,0,0), (0,0.3,0), (0,0,-0.5)]
+    voxels = [
+        Voxel(coords=(x, y, z), cargo=rng.choice([0, 1, 1, 2]), cargo_coords=rng.choice(orientations))
+        for x in range(dims[0]) for y in range(dims[1]) for z in range(dims[2])
+    ]
+    return Lattice(voxels, is_unit_cell=False)
+
+LATTICES = {
+    "nb1": nb1_lattice,
+    "sample": sample_lattice,
+    "checkered": checkered_lattice,
+    **{f"random_{seed}": (lambda seed=seed: random_lattice(seed, (3, 2, 2))) for seed in range(4)},
+}
+
+def reference_comp_paint(moses: Moses, queue: deque):
+    """the bond by bond walk comp_paint replaced: every uncolored bond in the order found, skipping painted ones"""
+    seen = set(queue)
+    while queue:
+        bond1 = queue.popleft()
+        if bond1.color is not None:
+            continue
+        voxel2, bond2 = bond1.partner.voxel, bond1.partner
+
+        if voxel2.id2:
+            pv = moses.mesovoxel.get_pv(voxel2.id2)
+            moses.painter.map_paint(pv, voxel2, flip=False)
+            if moses.paint_new_bond(bond1, bond2, "complementary"):
+                moses.painter.map_paint(voxel2, pv, flip=False)
+                continue
+
+        sv, cv = moses.mesovoxel.get_mesoparents(voxel2)
+        if voxel2.is_touching(sv.id2, type=2):
+            if not moses.mesovoxel.in_mesovoxel(-sv.id2, type=2):
+                moses.mesovoxel.add_comp_voxel(voxel2, sv)
+                for b in moses._shuffled(list(voxel2.bonds.values())):
+                    if b.color is None and b not in seen:
+                        queue.append(b)
+                        seen.add(b)
+            moses.painter.map_paint(sv, voxel2, flip=True)
+            flip = not cv
+        else:
+            moses.painter.map_paint(sv, voxel2, flip=False)
+            flip = False
+            voxel2.set_id2(sv.id2)
+        if moses.paint_new_bond(bond1, bond2, "complementary"):
+            moses.painter.map_paint(voxel2, sv, flip)
+
+@pytest.mark.parametrize("seed", [None, 1])
+@pytest.mark.parametrize("name", LATTICES)
+def test_comp_paint_matches_the_bond_walk(name, seed):
+    moses = Moses(LATTICES[name](), seed=seed)
+    moses.run()
+
+    reference = Moses(LATTICES[name](), seed=seed)
+    if seed is not None: # replay the shuffles in the same order as a fresh Moses (voxel order first)
+        reference.rng = np.random.default_rng(seed)
+        reference.rng.permutation(len(reference.lattice.voxels))
+    queue = deque(reference.get_uncolored_bonds())
+    reference.str_paint()
+    reference_comp_paint(reference, queue)
+    reference.map_lattice()
+
+    assert moses.n_colors == reference.n_colors
+    assert np.array_equal(moses.lattice.bond_color, reference.lattice.bond_color)
+    assert np.array_equal(moses.lattice.bond_type, reference.lattice.bond_type)
+    assert np.array_equal(moses.lattice.id2, reference.lattice.id2)
+
+def test_mapped_arrays_leave_the_lattice_alone():
+    moses = Moses(checkered_lattice())
+    moses.str_paint()
+    moses.comp_paint()
+    assert moses.batched_mapping() is None # so mapped_arrays has to map one by one
+
+    painter = moses.painter
+    before = moses.lattice.bond_color.copy(), moses.lattice.bond_type.copy(), moses.lattice.id2.copy()
+    counters = painter.skipped_remaps, painter.palindromic_rejections, painter.n_painted
+    mapped = [array.copy() for array in moses.mapped_arrays()]
+
+    assert all(np.array_equal(a, b) for a, b in zip(before, (moses.lattice.bond_color, moses.lattice.bond_type, moses.lattice.id2)))
+    assert (painter.skipped_remaps, painter.palindromic_rejections, painter.n_painted) == counters
+
+    moses.map_lattice(batched=False)
+    assert all(np.array_equal(a, b) for a, b in zip(mapped, (moses.lattice.bond_color, moses.lattice.bond_type, moses.lattice.id2)))
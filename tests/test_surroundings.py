@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+
+from algorithm.lattice.Voxel import Voxel
+from algorithm.lattice.Lattice import Lattice
+from algorithm.symmetry.Surroundings import Surroundings
+from algorithm.symmetry.SymmetryDf import SymmetryDf
+
+ORIENTATIONS = [(0,0,0), (0.3,0,0), (0,-0.3,0), (0,0,0.5)]
+
+def sample_lattice() -> Lattice:
+    """the 2x2x2 oriented sample lattice of the Surroundings demo"""
+    voxels = [
+        Voxel(coords=(0,0,0), cargo=1, cargo_coords=(0,0,0)),
+        Voxel(coords=(1,0,0), cargo=1, cargo_coords=(0,0,-0.5)),
+        Voxel(coords=(0,1,0), cargo=1, cargo_coords=(0,0,-0.5)),
+        Voxel(coords=(1,1,0), cargo=1, cargo_coords=(0,0,0)),
+        Voxel(coords=(0,0,1), cargo=2, cargo_coords=(0,0,0.5)),
+        Voxel(coords=(1,0,1), cargo=2, cargo_coords=(0,0,0)),
+        Voxel(coords=(0,1,1), cargo=2, cargo_coords=(0,0,0)),
+        Voxel(coords=(1,1,1), cargo=2, cargo_coords=(0,0,0.5)),
+    ]
+    return Lattice(voxels, is_unit_cell=False)
+
+def repeated_lattice(rng: np.random.Generator, dims: tuple[int, int, int], trial: int) -> Lattice:
+    """a random motif, repeated along x (and y) in some trials so there's symmetry to find"""
+    period = (max(dims[0] // (1 + trial % 2), 1), max(dims[1] // (1 + trial // 2), 1), dims[2])
+    cargo = rng.integers(0, 3, size=period)
+    orientation = rng.integers(0, len(ORIENTATIONS), size=period)
+    voxels = [
+        Voxel(coords=(x, y, z), cargo=int(cargo[x % period[0], y % period[1], z]),
+              cargo_coords=ORIENTATIONS[orientation[x % period[0], y % period[1], z]])
+        for x in range(dims[0]) for y in range(dims[1]) for z in range(dims[2])
+    ]
+    return Lattice(voxels, is_unit_cell=False)
+
+def sparse_lattice(rng: np.random.Generator, dims: tuple[int, int, int]) -> Lattice:
+    """a random mostly empty lattice"""
+    cargo = rng.choice([0, 0, 0, 0, 1, 2], size=dims)
+    orientation = np.where(cargo > 0, rng.integers(0, len(ORIENTATIONS), size=dims), 0)
+    voxels = [
+        Voxel(coords=(x, y, z), cargo=int(cargo[x, y, z]), cargo_coords=ORIENTATIONS[orientation[x, y, z]])
+        for x in range(dims[0]) for y in range(dims[1]) for z in range(dims[2])
+    ]
+    return Lattice(voxels, is_unit_cell=False)
+
+def test_legacy_surroundings_keep_the_cube():
+    lattice = sample_lattice()
+    surr = Surroundings(lattice)
+    assert surr.window == "cube"
+    assert len(surr.voxel_surroundings(0)) == (2 * max(lattice.dimensions) + 1)**3
+
+@pytest.mark.parametrize("dims", [(2,2,2), (3,2,2), (4,2,2), (4,4,1), (6,3,2), (3,2,1), (5,1,1), (4,4,4)])
+def test_periodic_window_matches_cube(dims):
+    # including anisotropic + repeating lattices, where the two windows differ in size
+    rng = np.random.default_rng(sum(d * 10**i for i, d in enumerate(dims)))
+    for trial in range(3):
+        lattice = repeated_lattice(rng, dims, trial)
+        cube = SymmetryDf(lattice, Surroundings(lattice, window="cube"), cache=False)
+        periodic = SymmetryDf(lattice, Surroundings(lattice, window="periodic"), cache=False)
+        assert np.array_equal(cube.symmetries.masks, periodic.symmetries.masks), trial
+        assert np.array_equal(cube.classes, periodic.classes), trial
+
+@pytest.mark.parametrize("window", Surroundings.WINDOWS)
+@pytest.mark.parametrize("dims", [(3,3,3), (4,2,2), (6,3,2), (5,1,1), (4,4,4)])
+def test_sparse_matches_dense(dims, window):
+    lattice = sparse_lattice(np.random.default_rng(sum(dims)), dims)
+    dense = SymmetryDf(lattice, Surroundings(lattice, window, representation="dense"), cache=False)
+    sparse_surr = Surroundings(lattice, window, representation="sparse")
+    sparse = SymmetryDf(lattice, sparse_surr, cache=False)
+    lazy = SymmetryDf(lattice, sparse_surr, mode="lazy", cache=False)
+    assert np.array_equal(dense.symmetries.masks, sparse.symmetries.masks)
+    assert np.array_equal(dense.classes, sparse.classes)
+    assert np.array_equal(sparse.symmetries.masks, lazy.symmetries.masks)
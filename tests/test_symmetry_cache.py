@@ -0,0 +1,14 @@
+import pytest
+
+from algorithm.symmetry.SymmetryCache import SymmetryCache
+
+@pytest.mark.parametrize("env, enabled, expected", [
+    (None, None, False), (None, True, True), (None, False, False),
+    ("1", None, True), ("1", False, False), ("0", True, False),
+])
+def test_cache_is_opt_in(monkeypatch, tmp_path, env, enabled, expected):
+    if env is None:
+        monkeypatch.delenv("MOSES_CACHE", raising=False)
+    else:
+        monkeypatch.setenv("MOSES_CACHE", env)
+    assert SymmetryCache(tmp_path, enabled=enabled).enabled == expected